@@ -1,9 +1,40 @@
 import os
+import io
+import hmac
+import csv
+import codecs
+import json
+import math
+import base64
+import time
 import datetime
+import logging
+from urllib.parse import urlencode
 import jwt
-from flask import Flask, request, jsonify
-from flask_sqlalchemy import SQLAlchemy
+import click
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
+from sqlalchemy import event, func, insert, tuple_, update
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+
+from backend.ai_service import ai_service
+from backend.cache import TTLCache
+from backend.database import (
+    db, init_db, engine_options, add_to_rollup, rebuild_expense_rollups, rebuild_daily_nutrition,
+    User, Expense, ExpenseDailyTotal, FoodItem, FoodEntry, DailyNutrition, DietPlan, DietJob
+)
+from backend.diet_generator import GenerationUnavailable, diet_generator
+from backend.food_catalog import food_catalog
+from backend.food_loader import FoodLoader, iter_rows
+from backend.food_search import food_search_index
+from backend.http_cache import args_fingerprint, conditional, make_etag, response_compressor
+from backend.http_client import CircuitOpenError
+from backend.jobs import DietJobWorker
+from backend.metrics import gauge_lines, request_metrics
+from backend.nutrition import DEFAULT_FORMULA, FORMULAS, compute_targets, normalize_profile, targets_as_dicts
+from backend.passwords import password_hasher
+from backend.plan_cache import plan_cache
+from backend.rate_limit import RateLimiter
 
 # --- Configuração da Aplicação ---
 database_url = os.environ.get('DATABASE_URL', 'sqlite:///dietapi.db')
@@ -16,8 +47,41 @@ app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'sua_chave_secreta_padrao_muito_segura')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['AUTH_CACHE_SIZE'] = int(os.environ.get('AUTH_CACHE_SIZE', 4096))
+app.config['AUTH_CACHE_TTL'] = int(os.environ.get('AUTH_CACHE_TTL', 300))
+app.config['EXPENSES_PAGE_SIZE'] = int(os.environ.get('EXPENSES_PAGE_SIZE', 50))
+app.config['EXPENSES_MAX_PAGE_SIZE'] = int(os.environ.get('EXPENSES_MAX_PAGE_SIZE', 500))
+app.config['EXPENSES_BULK_CHUNK_SIZE'] = int(os.environ.get('EXPENSES_BULK_CHUNK_SIZE', 1000))
+app.config['EXPENSES_BULK_MAX_ERRORS'] = int(os.environ.get('EXPENSES_BULK_MAX_ERRORS', 100))
+app.config['FOOD_ENTRIES_MAX_RESULTS'] = int(os.environ.get('FOOD_ENTRIES_MAX_RESULTS', 500))
+app.config['DIET_JOB_WORKERS'] = int(os.environ.get('DIET_JOB_WORKERS', 2))
+app.config['DIET_JOB_MAX_WAIT'] = int(os.environ.get('DIET_JOB_MAX_WAIT', 30))
+app.config['DIET_GENERATE_RATE_LIMIT'] = int(os.environ.get('DIET_GENERATE_RATE_LIMIT', 5))
+app.config['DIET_GENERATE_RATE_PERIOD'] = int(os.environ.get('DIET_GENERATE_RATE_PERIOD', 60))
+app.config['NUTRITION_TARGETS_MAX_BATCH'] = int(os.environ.get('NUTRITION_TARGETS_MAX_BATCH', 1000))
+
+app.config['SLOW_REQUEST_MS'] = int(os.environ.get('SLOW_REQUEST_MS', 500))
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR')
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+app.config['COMPRESS_RESPONSES'] = os.environ.get('COMPRESS_RESPONSES', '1') not in ('0', 'false')
+app.config['CATALOG_CACHE_MAX_AGE'] = int(os.environ.get('CATALOG_CACHE_MAX_AGE', 60))
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
+
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO'),
+    format='%(asctime)s %(levelname)s [%(name)s] %(message)s'
+)
+
+db.init_app(app)
+
+# Latência por rota, consultas SQL e requisições lentas, expostas em /metrics
+request_metrics.init_app(app)
 
-db = SQLAlchemy(app)
+# gzip/brotli conforme o Accept-Encoding (COMPRESS_RESPONSES=0 desliga)
+response_compressor.init_app(app)
 
 # Configuração de CORS (ORIGENS PERMITIDAS)
 # ATENÇÃO: Verifique manualmente as aspas aqui para evitar SyntaxError!
@@ -27,44 +91,114 @@ CORS(app, resources={r"/api/*": {"origins": [
     "http://localhost:3000"  # ESSENCIAL para o teste
 ]}})
 
-# --- Definição dos Modelos ---
+# O esquema e a carga inicial do catálogo não rodam no import: com vários
+# workers cada um faria o DDL ao mesmo tempo. O gunicorn.conf.py roda
+# `flask init-db` uma vez no master, antes de subir os workers.
+@app.cli.command('init-db')
+def init_db_command():
+    """Cria/atualiza as tabelas e popula o catálogo de alimentos"""
+    init_db(app)
+    print("✅ Banco de dados inicializado!")
 
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password = db.Column(db.String(80), nullable=False)
-    monthly_budget = db.Column(db.Float, default=0.0)
-    expenses = db.relationship('Expense', backref='user', lazy=True, cascade="all, delete-orphan")
+@app.cli.command('rebuild-expense-rollups')
+def rebuild_expense_rollups_command():
+    """Recalcula a tabela de totais diários de despesas"""
+    rebuild_expense_rollups()
+    print("✅ Totais diários de despesas recalculados!")
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'email': self.email,
-            'monthly_budget': self.monthly_budget
-        }
+@app.cli.command('import-foods')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'json', 'ndjson']),
+              help='Formato do arquivo (padrão: pela extensão).')
+@click.option('--chunk-size', default=1000, show_default=True, help='Linhas por lote/commit.')
+def import_foods_command(path, file_format, chunk_size):
+    """Carrega/atualiza alimentos e preços a partir de um arquivo CSV ou JSON"""
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.').lower()
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        stats = FoodLoader(chunk_size=chunk_size).load(iter_rows(stream, file_format))
 
-class Expense(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    description = db.Column(db.String(255), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
-    date_incurred = db.Column(db.Date, default=datetime.date.today, nullable=False)
-
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'user_id': self.user_id,
-            'description': self.description,
-            'amount': self.amount,
-            'date_incurred': self.date_incurred.isoformat()
-        }
+    print(f"✅ {stats['rows']} linhas em {stats['seconds']:.1f}s ({stats['rows_per_second']:.0f} linhas/s): "
+          f"{stats['inserted']} inseridos, {stats['updated']} atualizados, {stats['errors']} com erro.")
+    for sample in stats['error_samples']:
+        print(f"  linha {sample['row']}: {sample['message']}")
+
+@app.cli.command('hash-passwords')
+@click.option('--chunk-size', default=200, show_default=True, help='Usuários por lote/commit.')
+def hash_passwords_command(chunk_size):
+    """Converte senhas ainda gravadas em texto puro para hash"""
+    converted = 0
+    last_id = 0
+    while True:
+        users = User.query.filter(User.id > last_id).order_by(User.id).limit(chunk_size).all()
+        if not users:
+            break
+        last_id = users[-1].id
+        plain = [user for user in users if not password_hasher.is_hashed(user.password)]
+        for user, hashed in zip(plain, password_hasher.map_hash([user.password for user in plain])):
+            user.password = hashed
+        db.session.commit()
+        converted += len(plain)
+    print(f"✅ {converted} senhas convertidas para {password_hasher.algorithm}.")
 
-# Cria as tabelas
-with app.app_context():
-    db.create_all()
+@app.cli.command('rebuild-daily-nutrition')
+def rebuild_daily_nutrition_command():
+    """Recalcula a tabela de totais nutricionais diários"""
+    rebuild_daily_nutrition()
+    print("✅ Totais nutricionais diários recalculados!")
 
 # --- Helpers de Autenticação ---
 
+# Cache de identidade por worker: sujeito do token -> colunas do usuário.
+# A senha nunca entra no cache; se algum handler precisar dela, o atributo
+# é carregado sob demanda do banco.
+identity_cache = TTLCache(
+    maxsize=app.config['AUTH_CACHE_SIZE'],
+    ttl=app.config['AUTH_CACHE_TTL']
+)
+_CACHED_USER_FIELDS = ('id', 'email', 'monthly_budget')
+
+def _identity_key(data):
+    if data.get('sub'):
+        return f"id:{data['sub']}"
+    # Tokens antigos só carregam o email
+    return f"email:{data.get('email')}"
+
+def invalidate_user_identity(user):
+    identity_cache.delete(f"id:{user.id}")
+    identity_cache.delete(f"email:{user.email}")
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_identity_on_change(mapper, connection, target):
+    invalidate_user_identity(target)
+
+def load_user_from_token(data):
+    """Resolve o usuário do token, usando o cache antes do banco"""
+    key = _identity_key(data)
+    cached = identity_cache.get(key)
+    if cached is not None:
+        # Reanexa à sessão sem SELECT; atributos ausentes ficam expirados
+        user = User(**cached)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    if data.get('sub'):
+        user = db.session.get(User, int(data['sub']))
+    else:
+        user = User.query.filter_by(email=data.get('email')).first()
+
+    if user is not None:
+        identity_cache.set(key, {field: getattr(user, field) for field in _CACHED_USER_FIELDS})
+    return user
+
+def generate_token(user):
+    token_payload = {
+        'sub': str(user.id),
+        'email': user.email,
+        'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
+    }
+    return jwt.encode(token_payload, app.config['SECRET_KEY'], algorithm="HS256")
+
 def token_required(f):
     def wrapper(*args, **kwargs):
         token = None
@@ -75,17 +209,357 @@ def token_required(f):
             return jsonify({'message': 'Token de autenticação ausente!'}), 401
 
         try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = User.query.filter_by(email=data['email']).first()
+            with request_metrics.section('jwt'):
+                data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+            with request_metrics.section('auth_lookup'):
+                current_user = load_user_from_token(data)
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Token expirado. Por favor, faça login novamente.'}), 401
-        except jwt.InvalidTokenError:
+        except (jwt.InvalidTokenError, ValueError):
             return jsonify({'message': 'Token inválido.'}), 401
+
+        if current_user is None:
+            return jsonify({'message': 'Usuário do token não encontrado.'}), 401
         
         return f(current_user, *args, **kwargs)
     wrapper.__name__ = f.__name__
     return wrapper
 
+# --- Helpers de Paginação ---
+
+def encode_cursor(date_incurred, expense_id):
+    raw = f"{date_incurred.isoformat()}|{expense_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Retorna (data, id) do cursor ou lança ValueError"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        date_str, expense_id = base64.urlsafe_b64decode(padded).decode().split('|')
+    except Exception:
+        raise ValueError('cursor inválido')
+    return datetime.date.fromisoformat(date_str), int(expense_id)
+
+def parse_date_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"Parâmetro '{name}' deve estar no formato YYYY-MM-DD.")
+
+def expenses_page_query(user_id, date_from=None, date_to=None, after=None):
+    """Consulta keyset sobre (date_incurred, id), mais recentes primeiro"""
+    query = Expense.query.filter(Expense.user_id == user_id)
+    if date_from:
+        query = query.filter(Expense.date_incurred >= date_from)
+    if date_to:
+        query = query.filter(Expense.date_incurred <= date_to)
+    if after:
+        query = query.filter(tuple_(Expense.date_incurred, Expense.id) < tuple_(*after))
+    return query.order_by(Expense.date_incurred.desc(), Expense.id.desc())
+
+def iter_expenses(user_id, date_from=None, date_to=None, after=None, batch_size=500):
+    """Percorre as despesas em lotes keyset, sem carregar tudo em memória"""
+    while True:
+        batch = expenses_page_query(user_id, date_from, date_to, after).limit(batch_size).all()
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        after = (batch[-1].date_incurred, batch[-1].id)
+        # Libera os objetos já consumidos do identity map
+        for expense in batch:
+            db.session.expunge(expense)
+
+# --- Helpers de Resumo de Despesas ---
+
+def apply_expense_delta(user_id, day, amount, count):
+    """
+    Aplica uma variação ao total diário na transação corrente.
+    Deve ser chamada antes do commit da escrita da despesa.
+    """
+    add_to_rollup(ExpenseDailyTotal, {'user_id': user_id, 'day': day}, {'total': amount, 'count': count})
+
+def bump_expenses_revision(user_id):
+    """Invalida as ETags das leituras de despesas; chamar antes do commit da escrita"""
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(expenses_revision=func.coalesce(User.expenses_revision, 0) + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+def expenses_revision(user_id):
+    return db.session.query(User.expenses_revision).filter(User.id == user_id).scalar() or 0
+
+def expenses_etag(user_id, *parts):
+    return make_etag('expenses', user_id, expenses_revision(user_id), *parts)
+
+def parse_month_arg():
+    value = request.args.get('month')
+    if not value:
+        today = datetime.date.today()
+        return today.replace(day=1)
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise ValueError("Parâmetro 'month' deve estar no formato YYYY-MM.")
+
+# --- Helpers de Registro Alimentar ---
+
+NUTRITION_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'cost')
+
+def apply_nutrition_delta(user_id, day, values, sign):
+    """Soma (sign=1) ou subtrai (sign=-1) um registro do total diário, na transação corrente"""
+    deltas = {field: (values[field] or 0.0) * sign for field in NUTRITION_FIELDS}
+    add_to_rollup(DailyNutrition, {'user_id': user_id, 'date': day}, dict(deltas, entries=sign))
+
+def parse_food_entry(data):
+    """Valida o corpo de um registro alimentar. Retorna (alimento, quantidade, refeição, data)"""
+    try:
+        food_id = int(data.get('food_id'))
+        quantity = float(data.get('quantity', 1))
+    except (TypeError, ValueError):
+        raise ValueError("Campos 'food_id' e 'quantity' devem ser numéricos.")
+    if not math.isfinite(quantity) or quantity <= 0:
+        raise ValueError('Quantidade deve ser um número maior que zero.')
+
+    meal_type = (data.get('meal_type') or '').strip()
+    if not meal_type or len(meal_type) > 20:
+        raise ValueError("Campo 'meal_type' é obrigatório (até 20 caracteres).")
+
+    date_str = data.get('date')
+    try:
+        day = datetime.datetime.strptime(date_str, '%Y-%m-%d').date() if date_str else datetime.date.today()
+    except (TypeError, ValueError):
+        raise ValueError("Campo 'date' deve estar no formato YYYY-MM-DD.")
+
+    food = db.session.get(FoodItem, food_id)
+    if food is None:
+        raise LookupError('Alimento não encontrado.')
+    return food, quantity, meal_type, day
+
+# --- Helpers de Importação/Exportação ---
+
+EXPENSE_EXPORT_FIELDS = ['id', 'description', 'amount', 'date_incurred']
+
+def parse_expense_amount(value):
+    """Converte o valor de uma despesa em float finito ou lança ValueError"""
+    if value is None or value == '':
+        raise ValueError('Valor é obrigatório.')
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Valor inválido: {value!r}.")
+    if not math.isfinite(amount):
+        # float() aceita 'nan' e 'inf', que quebram o INSERT e os totais diários
+        raise ValueError(f"Valor inválido: {value!r}.")
+    return amount
+
+def validate_expense_row(row):
+    """Converte uma linha de importação em colunas de Expense ou lança ValueError"""
+    if isinstance(row, ValueError):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError('Linha deve ser um objeto.')
+
+    description = row.get('description') or ''
+    if not isinstance(description, str):
+        raise ValueError('Descrição deve ser um texto.')
+    description = description.strip()
+    if not description:
+        raise ValueError('Descrição é obrigatória.')
+    if len(description) > 255:
+        raise ValueError('Descrição excede 255 caracteres.')
+
+    amount = parse_expense_amount(row.get('amount'))
+
+    date_str = row.get('date_incurred')
+    if date_str and not isinstance(date_str, str):
+        raise ValueError(f"Data inválida: {date_str!r}. Use YYYY-MM-DD.")
+    if date_str:
+        try:
+            date_incurred = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            raise ValueError(f"Data inválida: {date_str!r}. Use YYYY-MM-DD.")
+    else:
+        date_incurred = datetime.date.today()
+
+    return {'description': description, 'amount': amount, 'date_incurred': date_incurred}
+
+def iter_import_rows():
+    """Lê as linhas do corpo da requisição conforme o Content-Type, sem bufferizar arquivos de texto"""
+    mimetype = request.mimetype
+    if mimetype == 'application/json':
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            raise ValueError('O corpo JSON deve ser uma lista de despesas.')
+        yield from data
+    elif mimetype in ('text/csv', 'application/x-ndjson'):
+        # Decodifica linha a linha: o input do gunicorn não é um objeto io completo
+        stream = codecs.iterdecode(request.stream, 'utf-8')
+        if mimetype == 'text/csv':
+            yield from csv.DictReader(stream)
+        else:
+            for line in stream:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # Linha inválida vira erro daquela linha, não da importação toda
+                        yield ValueError('JSON inválido.')
+    else:
+        raise ValueError('Content-Type não suportado. Use application/json, text/csv ou application/x-ndjson.')
+
+# --- Helpers de Dieta ---
+
+DIET_PROFILE_NUMBERS = ('age', 'weight', 'height')
+DIET_PROFILE_FIELDS = DIET_PROFILE_NUMBERS + ('gender', 'goal', 'activityLevel')
+# Limites superiores plausíveis: valores absurdos estouram os cálculos de BMR
+DIET_PROFILE_MAX = {'age': 150, 'weight': 700, 'height': 300}
+
+def parse_diet_profile(data):
+    """Extrai e valida o perfil usado no cálculo da dieta ou lança ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError('Perfil ausente.')
+
+    missing = [field for field in DIET_PROFILE_FIELDS if data.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Campos obrigatórios ausentes: {', '.join(missing)}.")
+
+    profile = {field: data[field] for field in DIET_PROFILE_FIELDS}
+    for field in DIET_PROFILE_NUMBERS:
+        try:
+            profile[field] = float(profile[field])
+        except (TypeError, ValueError):
+            raise ValueError(f"Campo '{field}' deve ser numérico.")
+        # float() aceita 'nan' e 'inf'; NaN também falha nas comparações abaixo
+        if not 0 < profile[field] <= DIET_PROFILE_MAX[field]:
+            raise ValueError(f"Campo '{field}' deve estar entre 0 e {DIET_PROFILE_MAX[field]}.")
+    # Aceita os rótulos do formulário ('Masculino', 'Perder Peso'...) e das chaves da API
+    return normalize_profile(profile)
+
+def parse_diet_request(data, current_user):
+    """Retorna (perfil, orçamento, semente) do corpo da requisição ou lança ValueError"""
+    profile = parse_diet_profile(data.get('profile', data))
+    try:
+        monthly_budget = float(data.get('monthly_budget', current_user.monthly_budget or 0.0))
+        seed = int(data.get('seed', 0))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("Campos 'monthly_budget' e 'seed' devem ser numéricos.")
+    if not math.isfinite(monthly_budget) or monthly_budget < 0:
+        raise ValueError("Campo 'monthly_budget' deve ser um número maior ou igual a zero.")
+    return profile, monthly_budget, seed
+
+def remember_profile(user, profile):
+    """Guarda o último perfil usado, base para o pré-cálculo em lote"""
+    serialized = json.dumps(profile, sort_keys=True)
+    if user.profile != serialized:
+        user.profile = serialized
+
+def build_diet_plan(profile, monthly_budget, seed=0):
+    """Gera (ou reaproveita do cache) o plano para o perfil. Retorna (plano, veio_do_cache)"""
+    catalog = food_catalog.get()
+    return plan_cache.get_or_generate(
+        profile, monthly_budget, catalog,
+        lambda normalized, budget: ai_service.generate_diet_with_budget(normalized, budget, catalog, seed),
+        seed
+    )
+
+def save_diet_plan(user_id, plan):
+    """Guarda o plano como o ativo do usuário (o commit fica com quem chama)"""
+    DietPlan.query.filter_by(user_id=user_id, is_active=True).update({'is_active': False})
+    saved = DietPlan(
+        user_id=user_id,
+        plan_data=json.dumps(plan),
+        total_cost=round(plan.get('total_daily_cost', 0.0) * 30, 2),
+        monthly_budget=plan.get('monthly_budget', 0.0),
+        is_active=True
+    )
+    db.session.add(saved)
+    return saved
+
+def run_diet_job(user_id, payload):
+    """Executado nas threads do DietJobWorker, dentro de um app context"""
+    plan, _ = build_diet_plan(payload['profile'], payload['monthly_budget'], payload.get('seed', 0))
+    saved = save_diet_plan(user_id, plan)
+    db.session.flush()
+    return saved
+
+diet_jobs = DietJobWorker(app, run_diet_job, max_workers=app.config['DIET_JOB_WORKERS'])
+
+@app.before_request
+def start_background_workers():
+    # Inicia depois do fork do gunicorn, no primeiro request de cada worker
+    diet_jobs.start()
+
+# Limite de gerações por usuário no proxy do modelo (chamadas pagas)
+diet_generate_limiter = RateLimiter(
+    limit=app.config['DIET_GENERATE_RATE_LIMIT'],
+    period=app.config['DIET_GENERATE_RATE_PERIOD']
+)
+
+@app.cli.command('precompute-diet-plans')
+@click.option('--wait', is_flag=True, help='Processa os jobs neste processo e espera terminarem.')
+def precompute_diet_plans_command(wait):
+    """Enfileira a geração de plano para todo usuário com perfil salvo"""
+    job_ids = []
+    for user in User.query.filter(User.profile.isnot(None)).yield_per(500):
+        payload = {'profile': json.loads(user.profile), 'monthly_budget': user.monthly_budget or 0.0, 'seed': 0}
+        job_ids.append(diet_jobs.submit(user.id, payload).id)
+    db.session.commit()
+    print(f"✅ {len(job_ids)} jobs de dieta enfileirados.")
+
+    if wait and job_ids:
+        diet_jobs.start()
+        diet_jobs.notify()
+        pending = set(job_ids)
+        while pending:
+            time.sleep(1)
+            db.session.rollback()
+            finished = DietJob.query.filter(
+                DietJob.id.in_(pending), DietJob.status.in_([DietJob.DONE, DietJob.FAILED])
+            ).with_entities(DietJob.id).all()
+            pending -= {job_id for (job_id,) in finished}
+        failed = DietJob.query.filter(DietJob.id.in_(job_ids), DietJob.status == DietJob.FAILED).count()
+        print(f"✅ Jobs concluídos ({failed} com falha).")
+
+@app.cli.command('nutrition-targets')
+@click.option('--output', type=click.Path(dir_okay=False), default='-', help='Arquivo CSV de saída (padrão: stdout).')
+@click.option('--formula', type=click.Choice(FORMULAS), help='Fórmula de BMR (padrão: NUTRITION_FORMULA).')
+@click.option('--chunk-size', default=5000, show_default=True, help='Perfis calculados por lote.')
+def nutrition_targets_command(output, formula, chunk_size):
+    """Recalcula as metas nutricionais de todo usuário com perfil salvo"""
+    fields = ['user_id', 'bmr', 'tdee', 'target_calories', 'protein', 'carbs', 'fat']
+    computed = skipped = 0
+    with click.open_file(output, 'w', encoding='utf-8') as stream:
+        writer = csv.writer(stream)
+        writer.writerow(fields)
+
+        def flush(user_ids, profiles):
+            for user_id, targets in zip(user_ids, targets_as_dicts(compute_targets(profiles, formula))):
+                writer.writerow([user_id] + [targets[field] for field in fields[1:]])
+
+        user_ids, profiles = [], []
+        for user_id, serialized in db.session.query(User.id, User.profile) \
+                .filter(User.profile.isnot(None)).order_by(User.id).yield_per(chunk_size):
+            try:
+                profiles.append(parse_diet_profile(json.loads(serialized)))
+            except ValueError:
+                skipped += 1
+                continue
+            user_ids.append(user_id)
+            if len(profiles) >= chunk_size:
+                flush(user_ids, profiles)
+                computed += len(profiles)
+                user_ids, profiles = [], []
+        if profiles:
+            flush(user_ids, profiles)
+            computed += len(profiles)
+
+    click.echo(f"✅ Metas calculadas para {computed} usuários ({skipped} perfis inválidos).", err=True)
+
 # --- Rotas de Autenticação ---
 
 @app.route('/api/register', methods=['POST'])
@@ -105,17 +579,13 @@ def register():
 
         user = User(
             email=email,
-            password=password,
+            password=password_hasher.hash(password),
             monthly_budget=float(monthly_budget)
         )
         db.session.add(user)
         db.session.commit()
 
-        token_payload = {
-            'email': user.email,
-            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
-        }
-        token = jwt.encode(token_payload, app.config['SECRET_KEY'], algorithm="HS256")
+        token = generate_token(user)
         
         return jsonify({
             'message': 'Usuário criado com sucesso',
@@ -123,8 +593,8 @@ def register():
             'profile': user.to_dict()
         }), 201
 
-    except Exception as e:
-        print(f"Erro no registro: {e}")
+    except Exception:
+        app.logger.exception("Erro interno do servidor ao registrar")
         return jsonify({'message': 'Erro interno do servidor ao registrar.'}), 500
 
 
@@ -138,13 +608,15 @@ def login():
         return jsonify({'message': 'Credenciais ausentes'}), 400
 
     user = User.query.filter_by(email=email).first()
-
-    if user and user.password == password:
-        token_payload = {
-            'email': user.email,
-            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24) 
-        }
-        token = jwt.encode(token_payload, app.config['SECRET_KEY'], algorithm="HS256")
+    if user is None:
+        # Mesmo custo de um login real: o tempo não revela se o email existe
+        password_hasher.verify_dummy(password)
+    elif password_hasher.verify(user.password, password):
+        if password_hasher.needs_rehash(user.password):
+            # Texto puro antigo ou algoritmo/custo alterado: regrava com os parâmetros atuais
+            user.password = password_hasher.hash(password)
+            db.session.commit()
+        token = generate_token(user)
         
         return jsonify({
             'message': 'Login bem-sucedido',
@@ -159,16 +631,65 @@ def login():
 @app.route('/api/profile', methods=['GET'])
 @token_required
 def get_profile(current_user):
-    return jsonify({'profile': current_user.to_dict()}), 200
+    # Os campos vêm do cache de identidade: o 304 não consulta o banco
+    profile = current_user.to_dict()
+    etag = make_etag('profile', *profile.values())
+    return conditional(etag, 'private, no-cache', lambda: jsonify({'profile': profile}))
 
 @app.route('/api/expenses', methods=['POST', 'GET'])
 @token_required
 def expenses(current_user):
     if request.method == 'GET':
         try:
-            expenses_list = Expense.query.filter_by(user_id=current_user.id).order_by(Expense.date_incurred.desc()).all()
-            return jsonify([expense.to_dict() for expense in expenses_list]), 200
-        except Exception as e:
+            date_from = parse_date_arg('from')
+            date_to = parse_date_arg('to')
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor) if cursor else None
+            limit = request.args.get('limit', type=int)
+            if limit is not None and limit <= 0:
+                raise ValueError("Parâmetro 'limit' deve ser um inteiro positivo.")
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+
+        wants_ndjson = (request.args.get('format') == 'ndjson' or
+                        request.accept_mimetypes.best == 'application/x-ndjson')
+
+        try:
+            if wants_ndjson:
+                # Sem limite explícito, o stream percorre todas as despesas do filtro
+                user_id = current_user.id
+
+                def generate():
+                    for count, expense in enumerate(iter_expenses(user_id, date_from, date_to, after)):
+                        if limit is not None and count >= limit:
+                            return
+                        yield json.dumps(expense.to_dict()) + '\n'
+
+                return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+            page_size = min(limit or app.config['EXPENSES_PAGE_SIZE'], app.config['EXPENSES_MAX_PAGE_SIZE'])
+
+            def build_page():
+                expenses_list = expenses_page_query(current_user.id, date_from, date_to, after).limit(page_size + 1).all()
+                has_more = len(expenses_list) > page_size
+                expenses_list = expenses_list[:page_size]
+
+                response = jsonify([expense.to_dict() for expense in expenses_list])
+                if has_more:
+                    last = expenses_list[-1]
+                    next_cursor = encode_cursor(last.date_incurred, last.id)
+                    response.headers['X-Next-Cursor'] = next_cursor
+                    args = request.args.to_dict()
+                    args['cursor'] = next_cursor
+                    next_url = f"{request.base_url}?{urlencode(args)}"
+                    response.headers['Link'] = f'<{next_url}>; rel="next"'
+                return response
+
+            # O 304 só consulta a revisão do usuário, sem carregar as despesas
+            etag = expenses_etag(current_user.id, 'page', args_fingerprint())
+            return conditional(etag, 'private, no-cache', build_page)
+        except Exception:
+            app.logger.exception("Erro interno ao listar despesas")
             return jsonify({'message': 'Erro interno ao listar despesas.'}), 500
 
     elif request.method == 'POST':
@@ -180,6 +701,10 @@ def expenses(current_user):
 
             if not description or amount is None:
                 return jsonify({'message': 'Descrição e valor são obrigatórios.'}), 400
+            try:
+                amount = parse_expense_amount(amount)
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 400
 
             try:
                 date_incurred = datetime.datetime.strptime(date_str, '%Y-%m-%d').date()
@@ -189,11 +714,13 @@ def expenses(current_user):
             new_expense = Expense(
                 user_id=current_user.id,
                 description=description,
-                amount=float(amount),
+                amount=amount,
                 date_incurred=date_incurred
             )
             
             db.session.add(new_expense)
+            apply_expense_delta(current_user.id, date_incurred, new_expense.amount, 1)
+            bump_expenses_revision(current_user.id)
             db.session.commit()
             
             return jsonify({
@@ -201,55 +728,585 @@ def expenses(current_user):
                 'expense': new_expense.to_dict()
             }), 201
 
-        except Exception as e:
+        except Exception:
+            app.logger.exception("Erro interno ao criar despesa")
             return jsonify({'message': 'Erro interno ao criar despesa.'}), 500
 
+@app.route('/api/expenses/bulk', methods=['POST'])
+@token_required
+def expenses_bulk_import(current_user):
+    """
+    Importa despesas em lote numa única transação.
+    Linhas inválidas são reportadas individualmente; com ?atomic=1 qualquer erro cancela tudo.
+    """
+    user_id = current_user.id
+    atomic = request.args.get('atomic') in ('1', 'true')
+    chunk_size = app.config['EXPENSES_BULK_CHUNK_SIZE']
+    max_errors = app.config['EXPENSES_BULK_MAX_ERRORS']
+
+    inserted = 0
+    errors = []
+    error_count = 0
+    chunk = []
+    daily_deltas = {}
+
+    def flush_chunk():
+        # executemany: um único INSERT preparado para o lote inteiro
+        db.session.execute(insert(Expense), chunk)
+        chunk.clear()
+
+    try:
+        for row_number, raw in enumerate(iter_import_rows(), start=1):
+            try:
+                values = validate_expense_row(raw)
+            except ValueError as e:
+                error_count += 1
+                if len(errors) < max_errors:
+                    errors.append({'row': row_number, 'message': str(e)})
+                continue
+
+            values['user_id'] = user_id
+            chunk.append(values)
+            total, count = daily_deltas.get(values['date_incurred'], (0.0, 0))
+            daily_deltas[values['date_incurred']] = (total + values['amount'], count + 1)
+            inserted += 1
+
+            if len(chunk) >= chunk_size:
+                flush_chunk()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    except Exception:
+        app.logger.exception("Erro interno ao importar despesas")
+        db.session.rollback()
+        return jsonify({'message': 'Erro interno ao importar despesas.'}), 500
+
+    report = {'inserted': inserted, 'error_count': error_count, 'errors': errors}
+
+    if atomic and error_count:
+        db.session.rollback()
+        report['inserted'] = 0
+        report['message'] = 'Importação cancelada: há linhas inválidas.'
+        return jsonify(report), 400
+
+    try:
+        if chunk:
+            flush_chunk()
+        for day, (total, count) in daily_deltas.items():
+            apply_expense_delta(user_id, day, total, count)
+        if inserted:
+            bump_expenses_revision(user_id)
+        db.session.commit()
+    except Exception:
+        app.logger.exception("Erro interno ao importar despesas")
+        db.session.rollback()
+        return jsonify({'message': 'Erro interno ao importar despesas.'}), 500
+
+    report['message'] = f'{inserted} despesas importadas.'
+    if inserted:
+        return jsonify(report), 201
+    return jsonify(report), 400 if error_count else 200
+
+@app.route('/api/expenses/export', methods=['GET'])
+@token_required
+def expenses_export(current_user):
+    try:
+        date_from = parse_date_arg('from')
+        date_to = parse_date_arg('to')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'message': "Formato deve ser 'csv' ou 'ndjson'."}), 400
+
+    user_id = current_user.id
+
+    def generate_ndjson():
+        for expense in iter_expenses(user_id, date_from, date_to):
+            yield json.dumps(expense.to_dict()) + '\n'
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPENSE_EXPORT_FIELDS)
+        for expense in iter_expenses(user_id, date_from, date_to):
+            writer.writerow([expense.id, expense.description, expense.amount,
+                             expense.date_incurred.isoformat()])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    if export_format == 'csv':
+        response = Response(stream_with_context(generate_csv()), mimetype='text/csv')
+    else:
+        response = Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename=despesas.{export_format}'
+    return response
+
+@app.route('/api/expenses/summary', methods=['GET'])
+@token_required
+def expenses_summary(current_user):
+    try:
+        month_start = parse_month_arg()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    next_month = (month_start + datetime.timedelta(days=32)).replace(day=1)
+
+    def build_summary():
+        rows = ExpenseDailyTotal.query.filter(
+            ExpenseDailyTotal.user_id == current_user.id,
+            ExpenseDailyTotal.day >= month_start,
+            ExpenseDailyTotal.day < next_month,
+            ExpenseDailyTotal.count > 0
+        ).order_by(ExpenseDailyTotal.day).all()
+
+        total_spent = sum(row.total for row in rows)
+
+        return jsonify({
+            'month': month_start.strftime('%Y-%m'),
+            'monthly_budget': monthly_budget,
+            'total_spent': round(total_spent, 2),
+            'remaining_budget': round(monthly_budget - total_spent, 2),
+            'expense_count': sum(row.count for row in rows),
+            'daily_totals': [
+                {'date': row.day.isoformat(), 'total': round(row.total, 2), 'count': row.count}
+                for row in rows
+            ]
+        })
+
+    try:
+        # O orçamento também aparece no resumo, então entra na ETag
+        monthly_budget = current_user.monthly_budget or 0.0
+        etag = expenses_etag(current_user.id, 'summary', month_start.isoformat(), monthly_budget)
+        return conditional(etag, 'private, no-cache', build_summary)
+    except Exception:
+        app.logger.exception("Erro interno ao resumir despesas")
+        return jsonify({'message': 'Erro interno ao resumir despesas.'}), 500
+
 @app.route('/api/expenses/<int:expense_id>', methods=['GET', 'PUT', 'DELETE'])
 @token_required
 def expense_detail(current_user, expense_id):
-    expense = Expense.query.filter_by(id=expense_id, user_id=current_user.id).first()
+    def load_expense():
+        return Expense.query.filter_by(id=expense_id, user_id=current_user.id).first()
 
-    if not expense:
+    def not_found():
         return jsonify({'message': 'Despesa não encontrada ou acesso negado.'}), 404
 
     if request.method == 'GET':
-        return jsonify(expense.to_dict()), 200
+        # Uma despesa removida muda a revisão, então um 304 nunca mascara um 404
+        def build_detail():
+            expense = load_expense()
+            return jsonify(expense.to_dict()) if expense else not_found()
+
+        etag = expenses_etag(current_user.id, 'detail', expense_id)
+        return conditional(etag, 'private, no-cache', build_detail)
 
-    elif request.method == 'PUT':
+    expense = load_expense()
+    if not expense:
+        return not_found()
+
+    if request.method == 'PUT':
         try:
             data = request.get_json()
+            old_date, old_amount = expense.date_incurred, expense.amount
+            try:
+                amount = parse_expense_amount(data['amount']) if 'amount' in data else None
+            except ValueError as e:
+                return jsonify({'message': str(e)}), 400
             
             if 'description' in data:
                 expense.description = data['description']
             if 'amount' in data:
-                expense.amount = float(data['amount'])
+                expense.amount = amount
             if 'date_incurred' in data:
                 try:
                     expense.date_incurred = datetime.datetime.strptime(data['date_incurred'], '%Y-%m-%d').date()
                 except:
                     pass 
 
+            if expense.date_incurred == old_date:
+                if expense.amount != old_amount:
+                    apply_expense_delta(current_user.id, old_date, expense.amount - old_amount, 0)
+            else:
+                apply_expense_delta(current_user.id, old_date, -old_amount, -1)
+                apply_expense_delta(current_user.id, expense.date_incurred, expense.amount, 1)
+
+            bump_expenses_revision(current_user.id)
             db.session.commit()
             return jsonify({
                 'message': 'Despesa atualizada com sucesso.',
                 'expense': expense.to_dict()
             }), 200
-        except Exception as e:
+        except Exception:
+            app.logger.exception("Erro interno ao atualizar despesa")
             return jsonify({'message': 'Erro interno ao atualizar despesa.'}), 500
 
     elif request.method == 'DELETE':
         try:
+            apply_expense_delta(current_user.id, expense.date_incurred, -expense.amount, -1)
+            bump_expenses_revision(current_user.id)
             db.session.delete(expense)
             db.session.commit()
             return jsonify({'message': 'Despesa removida com sucesso.'}), 200
-        except Exception as e:
+        except Exception:
+            app.logger.exception("Erro interno ao deletar despesa")
             return jsonify({'message': 'Erro interno ao deletar despesa.'}), 500
 
+# --- Rotas do Catálogo de Alimentos ---
+
+@app.route('/api/foods/search', methods=['GET'])
+def foods_search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'message': "Parâmetro 'q' é obrigatório."}), 400
+
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+
+    def build_results():
+        results = food_search_index.search(
+            query, category=request.args.get('category'),
+            min_price=min_price, max_price=max_price, limit=limit
+        )
+        return jsonify([dict(food, score=score) for score, food in results])
+
+    # Resposta pública: muda só quando a versão do catálogo muda
+    etag = make_etag('foods', food_catalog.current_version(), args_fingerprint())
+    return conditional(etag, f"public, max-age={app.config['CATALOG_CACHE_MAX_AGE']}", build_results)
+
+# --- Rotas de Registro Alimentar ---
+
+@app.route('/api/food-entries', methods=['POST', 'GET'])
+@token_required
+def food_entries(current_user):
+    if request.method == 'GET':
+        try:
+            day = parse_date_arg('date')
+            date_from = parse_date_arg('from') or day
+            date_to = parse_date_arg('to') or day
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        if not date_from and not date_to:
+            date_from = date_to = datetime.date.today()
+
+        query = FoodEntry.query.options(joinedload(FoodEntry.food_item)) \
+            .filter(FoodEntry.user_id == current_user.id)
+        if date_from:
+            query = query.filter(FoodEntry.date >= date_from)
+        if date_to:
+            query = query.filter(FoodEntry.date <= date_to)
+        entries = query.order_by(FoodEntry.date.desc(), FoodEntry.id.desc()) \
+            .limit(app.config['FOOD_ENTRIES_MAX_RESULTS']).all()
+        return jsonify([entry.to_dict() for entry in entries]), 200
+
+    try:
+        food, quantity, meal_type, day = parse_food_entry(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'message': str(e)}), 404
+
+    try:
+        entry = FoodEntry(
+            user_id=current_user.id,
+            food_id=food.id,
+            quantity=quantity,
+            meal_type=meal_type,
+            date=day,
+            calories=round(food.calories * quantity),
+            protein=food.protein * quantity,
+            carbs=food.carbs * quantity,
+            fat=food.fat * quantity,
+            cost=(food.average_price or 0.0) * quantity
+        )
+        db.session.add(entry)
+        apply_nutrition_delta(current_user.id, day, {
+            field: getattr(entry, field) for field in NUTRITION_FIELDS
+        }, 1)
+        db.session.commit()
+        return jsonify({
+            'message': 'Alimento registrado com sucesso!',
+            'entry': entry.to_dict()
+        }), 201
+    except Exception:
+        app.logger.exception("Erro interno ao registrar alimento")
+        return jsonify({'message': 'Erro interno ao registrar alimento.'}), 500
+
+@app.route('/api/food-entries/<int:entry_id>', methods=['DELETE'])
+@token_required
+def food_entry_detail(current_user, entry_id):
+    entry = FoodEntry.query.filter_by(id=entry_id, user_id=current_user.id).first()
+    if not entry:
+        return jsonify({'message': 'Registro não encontrado ou acesso negado.'}), 404
+
+    try:
+        values = {field: getattr(entry, field) for field in NUTRITION_FIELDS}
+        if entry.protein is None:
+            # Registro antigo sem valores gravados: mesmo critério do recálculo
+            food = entry.food_item
+            values.update(protein=food.protein * entry.quantity, carbs=food.carbs * entry.quantity,
+                          fat=food.fat * entry.quantity, cost=(food.average_price or 0.0) * entry.quantity)
+        apply_nutrition_delta(current_user.id, entry.date, values, -1)
+        db.session.delete(entry)
+        db.session.commit()
+        return jsonify({'message': 'Registro removido com sucesso.'}), 200
+    except Exception:
+        app.logger.exception("Erro interno ao remover registro")
+        return jsonify({'message': 'Erro interno ao remover registro.'}), 500
+
+@app.route('/api/nutrition/daily', methods=['GET'])
+@token_required
+def nutrition_daily(current_user):
+    try:
+        day = parse_date_arg('date') or datetime.date.today()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    totals = db.session.get(DailyNutrition, (current_user.id, day))
+    if totals is None or totals.entries <= 0:
+        totals = DailyNutrition(date=day, calories=0.0, protein=0.0, carbs=0.0, fat=0.0, cost=0.0, entries=0)
+    return jsonify(totals.to_dict()), 200
+
+@app.route('/api/nutrition/weekly', methods=['GET'])
+@token_required
+def nutrition_weekly(current_user):
+    try:
+        start = parse_date_arg('start')
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    if start is None:
+        today = datetime.date.today()
+        start = today - datetime.timedelta(days=today.weekday())
+    end = start + datetime.timedelta(days=6)
+
+    rows = {
+        row.date: row for row in DailyNutrition.query.filter(
+            DailyNutrition.user_id == current_user.id,
+            DailyNutrition.date >= start,
+            DailyNutrition.date <= end
+        )
+    }
+    days = []
+    for offset in range(7):
+        day = start + datetime.timedelta(days=offset)
+        row = rows.get(day)
+        if row is None or row.entries <= 0:
+            row = DailyNutrition(date=day, calories=0.0, protein=0.0, carbs=0.0, fat=0.0, cost=0.0, entries=0)
+        days.append(row.to_dict())
+
+    totals = {field: sum(day[field] for day in days) for field in NUTRITION_FIELDS}
+    logged_days = sum(1 for day in days if day['entries'] > 0)
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': days,
+        'totals': {field: round(value, 2) for field, value in totals.items()},
+        'daily_average': {
+            field: round(value / logged_days, 2) if logged_days else 0.0
+            for field, value in totals.items()
+        }
+    }), 200
+
+@app.route('/api/nutrition/targets', methods=['POST'])
+def nutrition_targets():
+    """
+    Metas de BMR, TDEE, calorias e macros para um perfil ou uma lista de perfis.
+    Corpo: o perfil, {'profile': {...}} ou {'profiles': [...]}; 'formula' opcional.
+    """
+    data = request.get_json(silent=True)
+    formula = None
+    if isinstance(data, dict):
+        formula = data.get('formula')
+        if 'profiles' in data:
+            data = data['profiles']
+        else:
+            data = data.get('profile', data)
+
+    batch = isinstance(data, list)
+    raw_profiles = data if batch else [data]
+    if not raw_profiles:
+        return jsonify({'message': 'Informe ao menos um perfil.'}), 400
+    if len(raw_profiles) > app.config['NUTRITION_TARGETS_MAX_BATCH']:
+        return jsonify({'message': f"Máximo de {app.config['NUTRITION_TARGETS_MAX_BATCH']} perfis por requisição."}), 400
+    if formula is not None and formula not in FORMULAS:
+        return jsonify({'message': f"Fórmula deve ser uma de: {', '.join(FORMULAS)}."}), 400
+
+    profiles = []
+    for index, raw in enumerate(raw_profiles):
+        try:
+            profiles.append(parse_diet_profile(raw))
+        except ValueError as e:
+            message = f"Perfil {index}: {e}" if batch else str(e)
+            return jsonify({'message': message}), 400
+
+    targets = targets_as_dicts(compute_targets(profiles, formula))
+    response = {'formula': formula or DEFAULT_FORMULA}
+    if batch:
+        response['results'] = targets
+    else:
+        response['targets'] = targets[0]
+    return jsonify(response), 200
+
+# --- Rotas de Dieta ---
+
+@app.route('/api/diet/plan', methods=['GET', 'POST'])
+@token_required
+def diet_plan(current_user):
+    if request.method == 'GET':
+        active = DietPlan.query.filter_by(user_id=current_user.id, is_active=True) \
+            .order_by(DietPlan.created_at.desc()).first()
+        if not active:
+            return jsonify({'message': 'Nenhum plano ativo.'}), 404
+        return jsonify(active.to_dict()), 200
+
+    data = request.get_json(silent=True) or {}
+    try:
+        profile, monthly_budget, seed = parse_diet_request(data, current_user)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        plan, cached = build_diet_plan(profile, monthly_budget, seed)
+        response = {'plan': plan, 'cached': cached}
+        if data.get('save'):
+            remember_profile(current_user, profile)
+            saved = save_diet_plan(current_user.id, plan)
+            db.session.commit()
+            response['diet_plan_id'] = saved.id
+        return jsonify(response), 200
+    except Exception:
+        app.logger.exception("Erro interno ao gerar dieta")
+        return jsonify({'message': 'Erro interno ao gerar dieta.'}), 500
+
+@app.route('/api/diet/generate', methods=['POST'])
+@token_required
+def diet_generate(current_user):
+    """Plano semanal em Markdown gerado pelo Gemini, via proxy com cache"""
+    data = request.get_json(silent=True) or {}
+    try:
+        profile, monthly_budget, _ = parse_diet_request(data, current_user)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    retry_after = diet_generate_limiter.hit(current_user.id)
+    if retry_after:
+        response = jsonify({'message': 'Muitas gerações em pouco tempo. Tente novamente em instantes.'})
+        response.headers['Retry-After'] = str(math.ceil(retry_after))
+        return response, 429
+
+    # Mesmas faixas do cache de planos: perfis quase iguais reaproveitam a resposta
+    profile, monthly_budget = plan_cache.normalize(profile, monthly_budget)
+    try:
+        diet, source = diet_generator.generate(profile, monthly_budget)
+    except GenerationUnavailable:
+        return jsonify({'message': 'Geração por IA não configurada.'}), 503
+    except CircuitOpenError:
+        return jsonify({'message': 'Serviço de IA temporariamente indisponível.'}), 503
+    except Exception:
+        app.logger.exception("Falha ao gerar dieta com a IA")
+        return jsonify({'message': 'Falha ao gerar dieta com a IA.'}), 502
+
+    return jsonify({'diet': diet, 'source': source, 'cached': source != 'model'}), 200
+
+@app.route('/api/diet/jobs', methods=['POST'])
+@token_required
+def diet_job_submit(current_user):
+    data = request.get_json(silent=True) or {}
+    try:
+        profile, monthly_budget, seed = parse_diet_request(data, current_user)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+
+    try:
+        remember_profile(current_user, profile)
+        job = diet_jobs.submit(current_user.id, {
+            'profile': profile, 'monthly_budget': monthly_budget, 'seed': seed
+        })
+        db.session.commit()
+        diet_jobs.notify()
+    except Exception:
+        app.logger.exception("Erro interno ao enfileirar dieta")
+        return jsonify({'message': 'Erro interno ao enfileirar dieta.'}), 500
+
+    response = jsonify({'message': 'Geração de dieta enfileirada.', 'job': job.to_dict()})
+    response.headers['Location'] = f"/api/diet/jobs/{job.id}"
+    return response, 202
+
+@app.route('/api/diet/jobs/<job_id>', methods=['GET'])
+@token_required
+def diet_job_detail(current_user, job_id):
+    job = DietJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    if not job:
+        return jsonify({'message': 'Job não encontrado ou acesso negado.'}), 404
+
+    # Long-poll opcional: ?wait=<segundos>
+    wait = min(request.args.get('wait', 0, type=float), app.config['DIET_JOB_MAX_WAIT'])
+    if wait > 0 and job.status not in (DietJob.DONE, DietJob.FAILED):
+        job = diet_jobs.wait_for(job_id, wait)
+
+    response = {'job': job.to_dict()}
+    if job.status == DietJob.DONE and job.diet_plan:
+        response['diet_plan'] = job.diet_plan.to_dict()
+    return jsonify(response), 200
+
 @app.route('/', methods=['GET'])
 def home():
     return "API DietAFácil está no ar!", 200
 
+# --- Métricas ---
+
+@request_metrics.register_collector
+def _cache_metrics():
+    lines = []
+    lines += gauge_lines('plan_cache_hits_total', 'Planos servidos do cache.', plan_cache.hits, 'counter')
+    lines += gauge_lines('plan_cache_misses_total', 'Planos gerados (miss no cache).', plan_cache.misses, 'counter')
+    lines += gauge_lines('plan_cache_entries', 'Planos em cache neste worker.', len(plan_cache.cache))
+    lines += gauge_lines('identity_cache_entries', 'Identidades de usuário em cache neste worker.', len(identity_cache))
+    lines += gauge_lines('diet_generate_cache_hits_total', 'Dietas da IA servidas do cache.', diet_generator.hits, 'counter')
+    lines += gauge_lines('diet_generate_model_calls_total', 'Chamadas ao modelo de IA.', diet_generator.misses, 'counter')
+    lines += gauge_lines('diet_generate_shared_total', 'Pedidos que aguardaram uma chamada idêntica em andamento.',
+                         diet_generator.shared, 'counter')
+    return lines
+
+@request_metrics.register_collector
+def _external_call_metrics():
+    lines = [
+        '# HELP external_calls_total Chamadas a serviços externos por resultado.',
+        '# TYPE external_calls_total counter',
+    ]
+    latency = [
+        '# HELP external_call_duration_seconds Latência das chamadas a serviços externos.',
+        '# TYPE external_call_duration_seconds summary',
+    ]
+    breaker = [
+        '# HELP external_circuit_open 1 quando o circuit breaker do serviço não está fechado.',
+        '# TYPE external_circuit_open gauge',
+    ]
+    for service, client in (('huggingface', ai_service.client), ('gemini', diet_generator.client)):
+        snapshot = client.metrics.snapshot()
+        for outcome, count in sorted(snapshot['outcomes'].items()):
+            lines.append(f'external_calls_total{{service="{service}",outcome="{outcome}"}} {count}')
+        latency.append(f'external_call_duration_seconds_count{{service="{service}"}} {snapshot["latency_count"]}')
+        latency.append(f'external_call_duration_seconds_sum{{service="{service}"}} {snapshot["latency_sum"]:.6f}')
+        breaker.append(f'external_circuit_open{{service="{service}"}} {int(client.breaker.state != "closed")}')
+    return lines + latency + breaker
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas deste worker no formato de texto do Prometheus"""
+    expected = app.config['METRICS_TOKEN']
+    if expected:
+        provided = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(provided.encode(), expected.encode()):
+            return jsonify({'message': 'Não autorizado.'}), 401
+    return request_metrics.response()
+
 # --- Execução do Servidor ---
 if __name__ == '__main__':
+    init_db(app)
     port = int(os.environ.get('PORT', 5000)) 
     app.run(debug=True, host='0.0.0.0', port=port)
\ No newline at end of file
@@ -1,29 +1,100 @@
-from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+import os
+from datetime import datetime, date
 import json
+import logging
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import func, insert, inspect, select, text, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 
 db = SQLAlchemy()
+logger = logging.getLogger(__name__)
 
-def init_db(app):
-    with app.app_context():
-        db.create_all()
+def engine_options(database_url):
+    """
+    Opções do engine único da aplicação.
+    O pool é por processo: com N workers do gunicorn o total de conexões
+    é N * (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+    """
+    options = {'pool_pre_ping': True}
+    if database_url.startswith('sqlite'):
+        return options
+
+    options.update({
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    })
+    return options
+
+# --- Usuários e Despesas ---
 
 class User(db.Model):
-    __tablename__ = 'users'
-    
+    # Mantém a tabela 'user' já usada em produção pelas rotas de despesas
+    __tablename__ = 'user'
+
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password = db.Column(db.String(120), nullable=False)
+    password = db.Column(db.String(255), nullable=False)  # hash (backend/passwords.py)
+    monthly_budget = db.Column(db.Float, default=0.0)
     profile = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=True)
     last_login = db.Column(db.DateTime, nullable=True)
-    monthly_budget = db.Column(db.Float, default=0.0)  
-    
+    # Incrementada a cada escrita em despesas; compõe as ETags das leituras
+    expenses_revision = db.Column(db.Integer, nullable=True, default=0)
+
+    expenses = db.relationship('Expense', backref='user', lazy=True, cascade="all, delete-orphan")
     food_entries = db.relationship('FoodEntry', backref='user', lazy=True)
     diet_plans = db.relationship('DietPlan', backref='user', lazy=True)
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'email': self.email,
+            'monthly_budget': self.monthly_budget
+        }
+
+class Expense(db.Model):
+    __tablename__ = 'expense'
+    # Cobre a listagem paginada: filtro por usuário + ordenação (data, id)
+    __table_args__ = (
+        db.Index('ix_expense_user_date_id', 'user_id', 'date_incurred', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    description = db.Column(db.String(255), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    date_incurred = db.Column(db.Date, default=date.today, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'description': self.description,
+            'amount': self.amount,
+            'date_incurred': self.date_incurred.isoformat()
+        }
+
+class ExpenseDailyTotal(db.Model):
+    """Total gasto por usuário por dia, mantido pelas rotas de escrita de despesas"""
+    __tablename__ = 'expense_daily_total'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    total = db.Column(db.Float, default=0.0, nullable=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+# --- Alimentos e Dietas ---
+
 class FoodItem(db.Model):
     __tablename__ = 'food_items'
+    # Upsert por nome na carga em lote; único para a carga inicial ser idempotente
+    __table_args__ = (
+        db.Index('uq_food_items_name', 'name', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -38,69 +109,375 @@ class FoodItem(db.Model):
     
     food_entries = db.relationship('FoodEntry', backref='food_item', lazy=True)
 
+class CatalogMeta(db.Model):
+    """Linha única com a versão do catálogo, incrementada a cada alteração em FoodItem"""
+    __tablename__ = 'catalog_meta'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, default=1, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+def get_catalog_version():
+    version = db.session.query(CatalogMeta.version).filter_by(id=1).scalar()
+    return version or 0
+
+def bump_catalog_version(connection=None):
+    """Incrementa a versão do catálogo na transação corrente"""
+    executor = connection if connection is not None else db.session
+    result = executor.execute(
+        update(CatalogMeta).where(CatalogMeta.id == 1)
+        .values(version=CatalogMeta.version + 1, updated_at=datetime.utcnow())
+    )
+    if result.rowcount == 0:
+        executor.execute(insert(CatalogMeta).values(id=1, version=1, updated_at=datetime.utcnow()))
+
 class FoodEntry(db.Model):
     __tablename__ = 'food_entries'
+    __table_args__ = (
+        db.Index('ix_food_entries_user_date', 'user_id', 'date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     food_id = db.Column(db.Integer, db.ForeignKey('food_items.id'), nullable=False)
     quantity = db.Column(db.Float, nullable=False)
     consumed_at = db.Column(db.DateTime, default=datetime.utcnow)
     meal_type = db.Column(db.String(20), nullable=False)
     calories = db.Column(db.Integer, nullable=False)
     date = db.Column(db.Date, nullable=False)
+    # Valores do alimento no momento do registro: mudanças de preço no
+    # catálogo não alteram o histórico nem os totais diários
+    protein = db.Column(db.Float, nullable=True)
+    carbs = db.Column(db.Float, nullable=True)
+    fat = db.Column(db.Float, nullable=True)
+    cost = db.Column(db.Float, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'food_id': self.food_id,
+            'food_name': self.food_item.name if self.food_item else None,
+            'quantity': self.quantity,
+            'meal_type': self.meal_type,
+            'calories': self.calories,
+            'protein': self.protein,
+            'carbs': self.carbs,
+            'fat': self.fat,
+            'cost': self.cost,
+            'date': self.date.isoformat(),
+            'consumed_at': self.consumed_at.isoformat() if self.consumed_at else None
+        }
+
+class DailyNutrition(db.Model):
+    """Totais nutricionais por usuário por dia, mantidos pelas rotas de FoodEntry"""
+    __tablename__ = 'daily_nutrition'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    date = db.Column(db.Date, primary_key=True)
+    calories = db.Column(db.Float, default=0.0, nullable=False)
+    protein = db.Column(db.Float, default=0.0, nullable=False)
+    carbs = db.Column(db.Float, default=0.0, nullable=False)
+    fat = db.Column(db.Float, default=0.0, nullable=False)
+    cost = db.Column(db.Float, default=0.0, nullable=False)
+    entries = db.Column(db.Integer, default=0, nullable=False)
+
+    def to_dict(self):
+        return {
+            'date': self.date.isoformat(),
+            'calories': round(self.calories),
+            'protein': round(self.protein, 1),
+            'carbs': round(self.carbs, 1),
+            'fat': round(self.fat, 1),
+            'cost': round(self.cost, 2),
+            'entries': self.entries
+        }
 
 class DietPlan(db.Model):  
     __tablename__ = 'diet_plans'
+    __table_args__ = (
+        db.Index('ix_diet_plans_user_active', 'user_id', 'is_active'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     plan_data = db.Column(db.Text, nullable=False)  # JSON com o plano completo
     total_cost = db.Column(db.Float, default=0.0)  # Custo total do plano
     monthly_budget = db.Column(db.Float, default=0.0)  # Orçamento usado
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'plan': json.loads(self.plan_data),
+            'total_cost': self.total_cost,
+            'monthly_budget': self.monthly_budget,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'is_active': self.is_active
+        }
+
+class DietJob(db.Model):
+    """Pedido de geração de dieta processado em segundo plano (fila no próprio banco)"""
+    __tablename__ = 'diet_jobs'
+    __table_args__ = (
+        db.Index('ix_diet_jobs_status_created', 'status', 'created_at'),
+    )
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(20), default=QUEUED, nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON com perfil, orçamento e semente
+    diet_plan_id = db.Column(db.Integer, db.ForeignKey('diet_plans.id'), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    diet_plan = db.relationship('DietPlan', lazy=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'diet_plan_id': self.diet_plan_id,
+            'error': self.error,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+# --- Manutenção do Schema ---
+
+def _add_missing_columns(engine):
+    """
+    create_all não altera tabelas existentes: adiciona as colunas anuláveis
+    que ainda não existem no banco (ex.: campos novos da tabela 'user').
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.quote(table.name)} "
+                    f"ADD COLUMN {preparer.quote(column.name)} {column_type}"
+                ))
+
+def _widen_columns(engine):
+    """Aumenta colunas VARCHAR que cresceram no modelo (o SQLite não impõe tamanho)"""
+    if engine.dialect.name == 'sqlite':
+        return
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name']: column['type'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                current = existing.get(column.name)
+                wanted = getattr(column.type, 'length', None)
+                current_length = getattr(current, 'length', None)
+                if wanted is None or current_length is None or current_length >= wanted:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                if engine.dialect.name == 'postgresql':
+                    statement = (f"ALTER TABLE {preparer.quote(table.name)} "
+                                 f"ALTER COLUMN {preparer.quote(column.name)} TYPE {column_type}")
+                else:
+                    statement = (f"ALTER TABLE {preparer.quote(table.name)} "
+                                 f"MODIFY {preparer.quote(column.name)} {column_type}"
+                                 f"{'' if column.nullable else ' NOT NULL'}")
+                conn.execute(text(statement))
+
+def _create_missing_indexes(engine):
+    """create_all também não cria índices novos em tabelas existentes"""
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(engine, checkfirst=True)
+            except SQLAlchemyError as e:
+                if not index.unique:
+                    raise
+                # Bancos antigos podem ter nomes repetidos (cargas concorrentes)
+                logger.warning("Índice único %s não criado; remova as linhas duplicadas: %s", index.name, e)
+
+def add_to_rollup(model, keys, deltas):
+    """
+    Soma `deltas` à linha de `model` identificada por `keys` (a chave
+    primária), criando-a se ainda não existir, na transação corrente.
+    É um único INSERT ... ON CONFLICT: duas transações que criam a mesma
+    linha ao mesmo tempo não colidem na chave primária.
+    """
+    dialect = db.session.get_bind().dialect.name
+    values = {**keys, **deltas}
+
+    if dialect in ('postgresql', 'sqlite'):
+        module = postgresql if dialect == 'postgresql' else sqlite
+        statement = module.insert(model).values(**values)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={name: getattr(model, name) + statement.excluded[name] for name in deltas}
+        )
+    elif dialect in ('mysql', 'mariadb'):
+        statement = mysql.insert(model).values(**values)
+        statement = statement.on_duplicate_key_update(
+            {name: getattr(model, name) + statement.inserted[name] for name in deltas}
+        )
+    else:
+        # Outros bancos: UPDATE e, se não houver linha, INSERT (sem proteção contra corrida)
+        result = db.session.execute(
+            update(model)
+            .where(*(getattr(model, name) == value for name, value in keys.items()))
+            .values({name: getattr(model, name) + delta for name, delta in deltas.items()})
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            db.session.add(model(**values))
+        return
+
+    db.session.execute(statement)
+
+def rebuild_expense_rollups(user_id=None):
+    """Recalcula os totais diários a partir da tabela de despesas"""
+    delete_query = ExpenseDailyTotal.query
+    source = select(
+        Expense.user_id, Expense.date_incurred, func.sum(Expense.amount), func.count(Expense.id)
+    ).group_by(Expense.user_id, Expense.date_incurred)
+    if user_id is not None:
+        delete_query = delete_query.filter_by(user_id=user_id)
+        source = source.where(Expense.user_id == user_id)
+
+    delete_query.delete(synchronize_session=False)
+    db.session.execute(
+        insert(ExpenseDailyTotal).from_select(['user_id', 'day', 'total', 'count'], source)
+    )
+    db.session.commit()
+
+def rebuild_daily_nutrition(user_id=None):
+    """Recalcula os totais nutricionais diários a partir de FoodEntry"""
+    delete_query = DailyNutrition.query
+    # Registros antigos, sem os valores gravados, usam o alimento atual do catálogo
+    source = select(
+        FoodEntry.user_id, FoodEntry.date,
+        func.sum(FoodEntry.calories),
+        func.sum(func.coalesce(FoodEntry.protein, FoodItem.protein * FoodEntry.quantity)),
+        func.sum(func.coalesce(FoodEntry.carbs, FoodItem.carbs * FoodEntry.quantity)),
+        func.sum(func.coalesce(FoodEntry.fat, FoodItem.fat * FoodEntry.quantity)),
+        func.sum(func.coalesce(FoodEntry.cost, FoodItem.average_price * FoodEntry.quantity)),
+        func.count(FoodEntry.id)
+    ).join(FoodItem, FoodItem.id == FoodEntry.food_id).group_by(FoodEntry.user_id, FoodEntry.date)
+    if user_id is not None:
+        delete_query = delete_query.filter_by(user_id=user_id)
+        source = source.where(FoodEntry.user_id == user_id)
+
+    delete_query.delete(synchronize_session=False)
+    db.session.execute(
+        insert(DailyNutrition).from_select(
+            ['user_id', 'date', 'calories', 'protein', 'carbs', 'fat', 'cost', 'entries'], source
+        )
+    )
+    db.session.commit()
+
+def insert_missing_foods(foods):
+    """
+    Insere os alimentos cujo nome ainda não existe e devolve quantos entraram.
+    Com o índice único em `name`, execuções simultâneas não duplicam linhas:
+    o INSERT ignora os nomes que outra transação gravou primeiro.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        module = postgresql if dialect == 'postgresql' else sqlite
+        statement = module.insert(FoodItem).values(foods).on_conflict_do_nothing()
+    elif dialect in ('mysql', 'mariadb'):
+        statement = mysql.insert(FoodItem).values(foods).prefix_with('IGNORE')
+    else:
+        existing = {name for (name,) in db.session.query(FoodItem.name)
+                    .filter(FoodItem.name.in_([food['name'] for food in foods]))}
+        foods = [food for food in foods if food['name'] not in existing]
+        if not foods:
+            return 0
+        statement = insert(FoodItem).values(foods)
+
+    inserted = db.session.execute(statement).rowcount
+    if inserted:
+        bump_catalog_version()
+    db.session.commit()
+    return inserted
+
 def init_db(app):
-    """Inicializa o banco de dados com dados padrão"""
+    """
+    Cria/atualiza o esquema e popula o catálogo com dados padrão.
+    Roda uma vez por deploy (flask init-db), não a cada import do app:
+    vários workers fazendo DDL ao mesmo tempo colidem entre si.
+    """
     with app.app_context():
         db.create_all()
+        _add_missing_columns(db.engine)
+        _widen_columns(db.engine)
+        _create_missing_indexes(db.engine)
+
+        # Primeira execução com as tabelas de totais: preenche a partir do histórico
+        rollups = [
+            (ExpenseDailyTotal, Expense, rebuild_expense_rollups),
+            (DailyNutrition, FoodEntry, rebuild_daily_nutrition),
+        ]
+        for rollup_model, source_model, rebuild in rollups:
+            if rollup_model.query.first() is None and source_model.query.first() is not None:
+                try:
+                    rebuild()
+                except Exception as e:
+                    # Outro worker pode ter feito o preenchimento ao mesmo tempo
+                    db.session.rollback()
+                    logger.warning("Aviso ao preencher %s: %s", rollup_model.__tablename__, e)
         
         # Popular banco se estiver vazio
-        if FoodItem.query.count() == 0:
+        if FoodItem.query.first() is None:
             default_foods = [
                 # Alimentos com preços médios
-                FoodItem(name="Maçã", calories=52, protein=0.3, fat=0.2, carbs=14.0, 
+                dict(name="Maçã", calories=52, protein=0.3, fat=0.2, carbs=14.0, 
                         portion_size="100g", category="fruta", average_price=2.50),
-                FoodItem(name="Banana", calories=89, protein=1.1, fat=0.3, carbs=22.8, 
+                dict(name="Banana", calories=89, protein=1.1, fat=0.3, carbs=22.8, 
                         portion_size="100g", category="fruta", average_price=1.80),
-                FoodItem(name="Frango Grelhado", calories=165, protein=31.0, fat=3.6, carbs=0.0, 
+                dict(name="Frango Grelhado", calories=165, protein=31.0, fat=3.6, carbs=0.0, 
                         portion_size="100g", category="proteína", average_price=12.00),
-                FoodItem(name="Arroz Integral", calories=111, protein=2.6, fat=0.9, carbs=23.0, 
+                dict(name="Arroz Integral", calories=111, protein=2.6, fat=0.9, carbs=23.0, 
                         portion_size="100g", category="carboidrato", average_price=4.50),
-                FoodItem(name="Ovo Cozido", calories=70, protein=6.3, fat=4.8, carbs=0.6, 
+                dict(name="Ovo Cozido", calories=70, protein=6.3, fat=4.8, carbs=0.6, 
                         portion_size="1 unidade", category="proteína", average_price=0.80),
-                FoodItem(name="Pão Integral", calories=80, protein=4.0, fat=1.0, carbs=14.0, 
+                dict(name="Pão Integral", calories=80, protein=4.0, fat=1.0, carbs=14.0, 
                         portion_size="1 fatia", category="carboidrato", average_price=0.30),
-                FoodItem(name="Queijo Cottage", calories=100, protein=14.0, fat=4.0, carbs=3.0, 
+                dict(name="Queijo Cottage", calories=100, protein=14.0, fat=4.0, carbs=3.0, 
                         portion_size="100g", category="laticínio", average_price=8.00),
-                FoodItem(name="Iogurte Natural", calories=59, protein=3.5, fat=3.3, carbs=4.0, 
+                dict(name="Iogurte Natural", calories=59, protein=3.5, fat=3.3, carbs=4.0, 
                         portion_size="100g", category="laticínio", average_price=3.50),
-                FoodItem(name="Aveia", calories=68, protein=2.4, fat=1.4, carbs=12.0, 
+                dict(name="Aveia", calories=68, protein=2.4, fat=1.4, carbs=12.0, 
                         portion_size="100g", category="carboidrato", average_price=5.00),
-                FoodItem(name="Salada Verde", calories=15, protein=1.0, fat=0.2, carbs=3.0, 
+                dict(name="Salada Verde", calories=15, protein=1.0, fat=0.2, carbs=3.0, 
                         portion_size="100g", category="vegetal", average_price=3.00),
-                FoodItem(name="Salmão", calories=200, protein=22.0, fat=12.0, carbs=0.0, 
+                dict(name="Salmão", calories=200, protein=22.0, fat=12.0, carbs=0.0, 
                         portion_size="100g", category="proteína", average_price=25.00),
-                FoodItem(name="Batata Doce", calories=86, protein=1.6, fat=0.1, carbs=20.0, 
+                dict(name="Batata Doce", calories=86, protein=1.6, fat=0.1, carbs=20.0, 
                         portion_size="100g", category="carboidrato", average_price=3.50),
-                FoodItem(name="Abacate", calories=160, protein=2.0, fat=15.0, carbs=9.0, 
+                dict(name="Abacate", calories=160, protein=2.0, fat=15.0, carbs=9.0, 
                         portion_size="100g", category="fruta", average_price=4.00),
-                FoodItem(name="Amêndoas", calories=579, protein=21.0, fat=50.0, carbs=22.0, 
+                dict(name="Amêndoas", calories=579, protein=21.0, fat=50.0, carbs=22.0, 
                         portion_size="100g", category="oleaginosas", average_price=15.00),
-                FoodItem(name="Leite Desnatado", calories=34, protein=3.4, fat=0.1, carbs=5.0, 
+                dict(name="Leite Desnatado", calories=34, protein=3.4, fat=0.1, carbs=5.0, 
                         portion_size="100ml", category="laticínio", average_price=2.00)
             ]
-            db.session.bulk_save_objects(default_foods)
-            db.session.commit()
-            print("✅ Banco de dados populado com alimentos e preços!")
\ No newline at end of file
+            if insert_missing_foods(default_foods):
+                print("✅ Banco de dados populado com alimentos e preços!")
\ No newline at end of file
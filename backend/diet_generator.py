@@ -0,0 +1,168 @@
+import os
+import hashlib
+import json
+
+from backend.cache import SingleFlight, TTLCache
+from backend.http_client import CircuitBreaker, ResilientClient
+from backend.nutrition import calculate_targets
+
+GEMINI_DEFAULT_URL = "https://generativelanguage.googleapis.com/v1beta"
+GEMINI_DEFAULT_MODEL = "gemini-2.5-flash-preview-09-2025"
+
+# Mesmo prompt que o Front-end montava no navegador
+SYSTEM_PROMPT = (
+    "Você é um Assistente Nutricional de IA, especializado em criar planos de dieta otimizados, "
+    "realistas e que respeitam o orçamento. Sua resposta DEVE ser apenas o plano de dieta "
+    "formatado em Markdown. Não inclua introduções, saudações ou explicações."
+)
+
+USER_PROMPT = """
+Gere um plano de dieta semanal (7 dias) realista e com foco em alimentos baratos no Brasil, priorizando a sustentabilidade orçamentária.
+
+**Dados do Usuário:**
+- Gênero: {gender}
+- Idade: {age} anos
+- Peso: {weight} kg
+- Altura: {height} cm
+- Nível de Atividade: {activity}
+- Objetivo Principal: {goal}
+- Orçamento Máximo Mensal: R$ {budget:.2f}
+
+**Metas Nutricionais Calculadas (Obrigatório seguir):**
+- Calorias Diárias Alvo: {calories} kcal
+- Proteína Alvo: {protein} gramas
+- Carboidrato Alvo: {carbs} gramas
+- Gordura Alvo: {fat} gramas
+
+O plano deve ser estruturado em Markdown, contendo uma breve análise de 2-3 linhas e uma tabela semanal (Dia 1 ao Dia 7) com sugestões de refeições (Café da Manhã, Almoço, Jantar).
+"""
+
+# Chaves da API -> rótulos exibidos no formulário do Front-end
+GENDER_LABELS = {'male': 'Masculino', 'female': 'Feminino'}
+ACTIVITY_LABELS = {
+    'sedentary': 'Sedentário', 'light': 'Levemente Ativo', 'moderate': 'Moderadamente Ativo',
+    'active': 'Muito Ativo', 'very_active': 'Extremamente Ativo'
+}
+GOAL_LABELS = {'weight_loss': 'Perder Peso', 'maintain': 'Manter Peso', 'gain_muscle': 'Ganhar Massa Muscular'}
+
+class GenerationUnavailable(Exception):
+    """Geração por IA desligada (sem chave configurada)"""
+
+def _number(value):
+    return int(value) if float(value).is_integer() else value
+
+def build_prompt(profile, monthly_budget):
+    """Prompt do usuário para um perfil já normalizado (chaves da API)"""
+    targets = calculate_targets(profile)
+    return USER_PROMPT.format(
+        gender=GENDER_LABELS[profile['gender']],
+        age=_number(profile['age']),
+        weight=_number(profile['weight']),
+        height=_number(profile['height']),
+        activity=ACTIVITY_LABELS[profile['activityLevel']],
+        goal=GOAL_LABELS[profile['goal']],
+        budget=monthly_budget,
+        calories=round(targets['target_calories']),
+        protein=round(targets['protein']),
+        carbs=round(targets['carbs']),
+        fat=round(targets['fat']),
+    ).strip()
+
+def prompt_key(model, system_prompt, prompt, temperature):
+    """Hash do prompt com espaços normalizados: diferenças de formatação não geram chaves novas"""
+    normalized = json.dumps(
+        [model, ' '.join(system_prompt.split()), ' '.join(prompt.split()), temperature],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+def extract_text(response_json):
+    """Texto da primeira candidata do generateContent ou ValueError"""
+    try:
+        parts = response_json['candidates'][0]['content']['parts']
+    except (KeyError, IndexError, TypeError):
+        raise ValueError('Resposta do modelo sem conteúdo.')
+    text = ''.join(part.get('text', '') for part in parts if isinstance(part, dict)).strip()
+    if not text:
+        raise ValueError('Resposta do modelo sem conteúdo.')
+    return text
+
+class DietGenerator:
+    """
+    Proxy do generateContent do Gemini para o plano semanal em Markdown.
+    O prompt é montado no servidor; respostas ficam em cache LRU com TTL
+    pelo hash do prompt normalizado, e pedidos idênticos simultâneos
+    compartilham uma única chamada ao modelo (single-flight).
+    """
+
+    def __init__(self, api_url=None, api_key=None, model=None, temperature=0.7,
+                 use_search=True, client=None, cache=None):
+        self.api_url = (api_url or os.environ.get('GEMINI_API_URL', GEMINI_DEFAULT_URL)).rstrip('/')
+        self.api_key = api_key if api_key is not None else os.environ.get('GEMINI_API_KEY')
+        self.model = model or os.environ.get('GEMINI_MODEL', GEMINI_DEFAULT_MODEL)
+        self.temperature = temperature
+        self.use_search = use_search
+        self.client = client or ResilientClient(
+            connect_timeout=float(os.environ.get('GEMINI_CONNECT_TIMEOUT', 2.0)),
+            read_timeout=float(os.environ.get('GEMINI_READ_TIMEOUT', 60.0)),
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.environ.get('GEMINI_BREAKER_THRESHOLD', 3)),
+                reset_timeout=float(os.environ.get('GEMINI_BREAKER_RESET', 60.0))
+            )
+        )
+        self.cache = cache or TTLCache(
+            maxsize=int(os.environ.get('DIET_GENERATE_CACHE_SIZE', 1024)),
+            ttl=int(os.environ.get('DIET_GENERATE_CACHE_TTL', 24 * 3600))
+        )
+        self._in_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+
+    def generate(self, profile, monthly_budget):
+        """
+        Devolve (markdown, origem), com origem 'cache', 'shared' (pegou carona
+        em uma chamada em andamento) ou 'model'.
+        """
+        if not self.api_key:
+            raise GenerationUnavailable()
+
+        prompt = build_prompt(profile, monthly_budget)
+        key = prompt_key(self.model, SYSTEM_PROMPT, prompt, self.temperature)
+
+        text = self.cache.get(key)
+        if text is not None:
+            self.hits += 1
+            return text, 'cache'
+
+        def call_model():
+            # Outra chamada pode ter preenchido o cache enquanto esperávamos a vez
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+            self.misses += 1
+            result = self._call(prompt)
+            self.cache.set(key, result)
+            return result
+
+        text, shared = self._in_flight.do(key, call_model)
+        if shared:
+            self.shared += 1
+        return text, 'shared' if shared else 'model'
+
+    def _call(self, prompt):
+        payload = {
+            'contents': [{'parts': [{'text': prompt}]}],
+            'systemInstruction': {'parts': [{'text': SYSTEM_PROMPT}]},
+            'generationConfig': {'temperature': self.temperature},
+        }
+        if self.use_search:
+            payload['tools'] = [{'google_search': {}}]
+        return self.client.post_json(
+            f"{self.api_url}/models/{self.model}:generateContent",
+            payload,
+            headers={'x-goog-api-key': self.api_key},
+            validate=extract_text
+        )
+
+diet_generator = DietGenerator()
@@ -0,0 +1,198 @@
+import random
+import time
+
+from backend.nutrition import MACROS, macro_targets
+
+# Mesma estrutura de 4 refeições usada no Front-end
+MEAL_DISTRIBUTION = [
+    ('Café da Manhã', 0.25),
+    ('Almoço', 0.35),
+    ('Jantar', 0.25),
+    ('Lanche', 0.15),
+]
+
+class DietOptimizer:
+    """
+    Escolhe alimentos e quantidades de porções por refeição minimizando o
+    desvio da meta calórica e de macros, sem ultrapassar o orçamento.
+
+    O problema é um knapsack inteiro (porções em passos de `portion_step`),
+    resolvido por busca local com reinícios: cada reinício parte de um
+    alimento sorteado e aplica o melhor movimento +/- uma porção até não
+    haver melhora. Com a mesma semente o resultado é sempre o mesmo; o
+    `time_limit` é apenas uma trava de segurança por plano.
+    """
+
+    def __init__(self, portion_step=0.5, max_portions=4.0, max_foods_per_meal=3,
+                 candidates_per_meal=40, restarts=6, time_limit=0.5,
+                 macro_weight=0.5, cost_weight=0.05):
+        self.portion_step = portion_step
+        self.max_portions = max_portions
+        self.max_foods_per_meal = max_foods_per_meal
+        self.candidates_per_meal = candidates_per_meal
+        self.restarts = restarts
+        self.time_limit = time_limit
+        self.macro_weight = macro_weight
+        self.cost_weight = cost_weight
+
+    def optimize_day(self, foods, calories_needed, daily_budget, goal, seed=0):
+        """
+        Monta as refeições do dia.
+        Retorna (meals, totals) com totals contendo calorias, macros e custo reais.
+        """
+        rng = random.Random(seed)
+        started = time.perf_counter()
+        daily_macros = macro_targets(calories_needed, goal)
+
+        usable = [f for f in foods if f.get('protein') is not None and f['calories']]
+        rankings = self._density_rankings(usable)
+        meals = []
+        totals = {'calories': 0.0, 'protein': 0.0, 'carbs': 0.0, 'fat': 0.0, 'cost': 0.0}
+        remaining_budget = daily_budget
+        remaining_ratio = 1.0
+
+        for name, ratio in MEAL_DISTRIBUTION:
+            # Sobra de orçamento das refeições anteriores passa para as seguintes
+            meal_budget = remaining_budget * ratio / remaining_ratio
+            remaining_ratio -= ratio
+            targets = {'calories': calories_needed * ratio}
+            targets.update({macro: grams * ratio for macro, grams in daily_macros.items()})
+
+            # Cada refeição pode usar até o fim da sua fatia do tempo total
+            deadline = started + self.time_limit * (1.0 - remaining_ratio)
+            candidates = self._candidates(usable, rankings, meal_budget)
+            selection = self._optimize_meal(candidates, targets, meal_budget, rng, deadline)
+            if not selection:
+                continue
+
+            meal_totals = self._totals(candidates, selection)
+            remaining_budget -= meal_totals['cost']
+            for key in totals:
+                totals[key] += meal_totals[key]
+
+            meals.append({
+                'name': name,
+                'foods': [
+                    {
+                        'name': candidates[i]['name'],
+                        'portion': candidates[i]['portion_size'],
+                        'quantity': quantity,
+                        'calories': round(candidates[i]['calories'] * quantity)
+                    } for i, quantity in sorted(selection.items())
+                ],
+                'calories': round(meal_totals['calories']),
+                'target_calories': round(targets['calories']),
+                'cost': round(meal_totals['cost'], 2)
+            })
+
+        return meals, totals
+
+    def _density_rankings(self, foods):
+        """Índices dos alimentos ordenados por calorias/macro por real, uma vez por plano"""
+        if len(foods) <= self.candidates_per_meal:
+            return None
+
+        rankings = []
+        for key in MACROS + ('calories',):
+            density = [f[key] / max(f['average_price'], 0.01) for f in foods]
+            rankings.append(sorted(range(len(foods)), key=density.__getitem__, reverse=True))
+        return rankings
+
+    def _candidates(self, foods, rankings, budget):
+        """
+        Limita a busca aos alimentos que cabem no orçamento da refeição,
+        priorizando os que entregam mais de cada macro por real gasto.
+        """
+        step_budget = budget / self.portion_step
+        if rankings is None:
+            return [f for f in foods if f['average_price'] <= step_budget]
+
+        per_macro = max(1, self.candidates_per_meal // len(rankings))
+        chosen = {}
+        for ranking in rankings:
+            taken = 0
+            for index in ranking:
+                if foods[index]['average_price'] <= step_budget:
+                    chosen.setdefault(index, foods[index])
+                    taken += 1
+                    if taken == per_macro:
+                        break
+        return list(chosen.values())
+
+    def _totals(self, candidates, selection):
+        totals = {'calories': 0.0, 'protein': 0.0, 'carbs': 0.0, 'fat': 0.0, 'cost': 0.0}
+        for i, quantity in selection.items():
+            food = candidates[i]
+            totals['calories'] += food['calories'] * quantity
+            totals['cost'] += food['average_price'] * quantity
+            for macro in MACROS:
+                totals[macro] += food[macro] * quantity
+        return totals
+
+    def _score(self, totals, targets, budget):
+        score = ((totals['calories'] - targets['calories']) / targets['calories']) ** 2
+        for macro in MACROS:
+            if targets[macro] > 0:
+                score += self.macro_weight * ((totals[macro] - targets[macro]) / targets[macro]) ** 2
+        if budget > 0:
+            score += self.cost_weight * totals['cost'] / budget
+        return score
+
+    def _optimize_meal(self, candidates, targets, budget, rng, deadline):
+        if not candidates or targets['calories'] <= 0:
+            return {}
+
+        step = self.portion_step
+        best_selection, best_score = {}, None
+
+        for restart in range(self.restarts):
+            if restart and time.perf_counter() > deadline:
+                break
+
+            start = rng.randrange(len(candidates))
+            selection = {start: step}
+            totals = self._totals(candidates, selection)
+            if totals['cost'] > budget:
+                continue
+            score = self._score(totals, targets, budget)
+
+            while time.perf_counter() <= deadline:
+                move, move_totals, move_score = None, None, score
+                for i, food in enumerate(candidates):
+                    current = selection.get(i, 0.0)
+                    for delta in (step, -step):
+                        quantity = current + delta
+                        if quantity < 0 or quantity > self.max_portions:
+                            continue
+                        if current == 0 and len(selection) >= self.max_foods_per_meal:
+                            continue
+
+                        new_totals = {
+                            'calories': totals['calories'] + food['calories'] * delta,
+                            'cost': totals['cost'] + food['average_price'] * delta,
+                        }
+                        if new_totals['cost'] > budget + 1e-9:
+                            continue
+                        for macro in MACROS:
+                            new_totals[macro] = totals[macro] + food[macro] * delta
+
+                        new_score = self._score(new_totals, targets, budget)
+                        if new_score < move_score - 1e-12:
+                            move, move_totals, move_score = (i, quantity), new_totals, new_score
+
+                if move is None:
+                    break
+
+                i, quantity = move
+                if quantity == 0:
+                    del selection[i]
+                else:
+                    selection[i] = quantity
+                totals, score = move_totals, move_score
+
+            if selection and (best_score is None or score < best_score):
+                best_selection, best_score = dict(selection), score
+
+        return best_selection
+
+diet_optimizer = DietOptimizer()
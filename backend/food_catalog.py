@@ -0,0 +1,186 @@
+import os
+import time
+import threading
+from bisect import bisect_right
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from backend.database import db, FoodItem, bump_catalog_version, get_catalog_version
+
+FOOD_FIELDS = ('id', 'name', 'calories', 'protein', 'fat', 'carbs',
+               'portion_size', 'category', 'average_price')
+
+class FoodCatalog:
+    """
+    Snapshot imutável do catálogo de alimentos.
+    Os alimentos ficam ordenados por preço, em colunas paralelas, para que
+    os filtros por orçamento sejam buscas binárias em vez de varreduras.
+    """
+
+    def __init__(self, foods, version=0, presorted=False):
+        if not presorted:
+            foods = sorted(foods, key=lambda f: f['average_price'])
+        self.version = version
+        self.foods = foods
+        self.prices = [f['average_price'] for f in foods]
+
+        # Índice por categoria: posições (já ordenadas por preço) + preços
+        self._categories = {}
+        for position, food in enumerate(foods):
+            positions, prices = self._categories.setdefault(food['category'], ([], []))
+            positions.append(position)
+            prices.append(food['average_price'])
+
+    @classmethod
+    def from_items(cls, items, version=0):
+        return cls([{field: getattr(item, field) for field in FOOD_FIELDS} for item in items], version)
+
+    def __len__(self):
+        return len(self.foods)
+
+    def __iter__(self):
+        return iter(self.foods)
+
+    def __getitem__(self, index):
+        return self.foods[index]
+
+    @property
+    def categories(self):
+        return list(self._categories)
+
+    def affordable(self, max_price, category=None):
+        """Sub-catálogo com os alimentos de preço <= max_price (O(log n) para achar o corte)"""
+        if category is None:
+            cut = bisect_right(self.prices, max_price)
+            return FoodCatalog(self.foods[:cut], self.version, presorted=True)
+
+        positions, prices = self._categories.get(category, ([], []))
+        cut = bisect_right(prices, max_price)
+        return FoodCatalog([self.foods[p] for p in positions[:cut]], self.version, presorted=True)
+
+    def by_category(self, category):
+        positions, _ = self._categories.get(category, ([], []))
+        return FoodCatalog([self.foods[p] for p in positions], self.version, presorted=True)
+
+    def cheapest(self, n):
+        return FoodCatalog(self.foods[:n], self.version, presorted=True)
+
+class CatalogStore:
+    """
+    Catálogo compartilhado por todas as requisições do worker.
+    É carregado do banco na primeira leitura e recarregado após qualquer
+    commit que altere FoodItem. Alterações feitas por outros processos
+    (carga em lote, outros workers) são percebidas pela versão gravada em
+    catalog_meta, consultada no máximo a cada `check_interval` segundos.
+    """
+
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self._catalog = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._known_version = None
+        self._resync = False
+
+    def get(self):
+        self.check_version()
+        catalog = self._catalog
+        if catalog is not None:
+            return catalog
+
+        with self._lock:
+            if self._catalog is None:
+                version = get_catalog_version()
+                items = db.session.query(FoodItem).all()
+                self._catalog = FoodCatalog.from_items(items, version)
+                self._known_version = version
+            return self._catalog
+
+    def check_version(self):
+        """Avisa os listeners com uma recarga completa se outro processo mudou o catálogo"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+
+        version = get_catalog_version()
+        if self._known_version is None or self._resync:
+            # Primeira leitura, ou a mudança foi deste processo e já foi propagada
+            self._known_version = version
+            self._resync = False
+        elif version != self._known_version:
+            self._known_version = version
+            _notify_listeners(None, None)
+
+    def current_version(self):
+        """Versão refletida pelos índices deste processo (usada nas ETags)"""
+        self.check_version()
+        return self._known_version
+
+    def invalidate(self):
+        with self._lock:
+            self._catalog = None
+
+    def mark_local_change(self):
+        self._resync = True
+        self._checked_at = 0.0
+
+food_catalog = CatalogStore(check_interval=float(os.environ.get('CATALOG_VERSION_CHECK_INTERVAL', 5.0)))
+
+# --- Invalidação por eventos do ORM ---
+
+_change_listeners = []
+
+def on_food_items_changed(callback):
+    """
+    Registra callback(upserted_ids, deleted_ids) chamado após commits que
+    alteram FoodItem. Quando a mudança veio de outro processo os ids não
+    são conhecidos e ambos chegam como None: o listener deve recarregar tudo.
+    """
+    _change_listeners.append(callback)
+    return callback
+
+def _notify_listeners(upserted, deleted):
+    for callback in _change_listeners:
+        callback(upserted, deleted)
+
+on_food_items_changed(lambda upserted, deleted: food_catalog.invalidate())
+
+def _record_change(connection, target, deleted=False):
+    session = object_session(target)
+    if session is None:
+        return
+    # Uma vez por transação, junto com a própria escrita
+    if not session.info.get('catalog_version_bumped'):
+        bump_catalog_version(connection)
+        session.info['catalog_version_bumped'] = True
+    upserted, removed = session.info.setdefault('food_items_changed', (set(), set()))
+    if deleted:
+        removed.add(target.id)
+        upserted.discard(target.id)
+    else:
+        upserted.add(target.id)
+
+@event.listens_for(FoodItem, 'after_insert')
+@event.listens_for(FoodItem, 'after_update')
+def _food_item_saved(mapper, connection, target):
+    _record_change(connection, target)
+
+@event.listens_for(FoodItem, 'after_delete')
+def _food_item_deleted(mapper, connection, target):
+    _record_change(connection, target, deleted=True)
+
+@event.listens_for(Session, 'after_commit')
+def _notify_food_changes(session):
+    session.info.pop('catalog_version_bumped', None)
+    changes = session.info.pop('food_items_changed', None)
+    if not changes:
+        return
+    food_catalog.mark_local_change()
+    _notify_listeners(*changes)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_food_changes(session):
+    session.info.pop('catalog_version_bumped', None)
+    session.info.pop('food_items_changed', None)
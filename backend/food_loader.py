@@ -0,0 +1,195 @@
+import csv
+import json
+import time
+
+from sqlalchemy import insert, update
+
+from backend.database import db, FoodItem, bump_catalog_version
+
+# Nomes de coluna aceitos, incluindo os usados em tabelas no estilo TACO
+FIELD_ALIASES = {
+    'name': ('name', 'nome', 'alimento', 'descricao'),
+    'calories': ('calories', 'kcal', 'energia_kcal', 'energia'),
+    'protein': ('protein', 'proteina', 'proteinas'),
+    'fat': ('fat', 'lipideos', 'gordura', 'gorduras'),
+    'carbs': ('carbs', 'carboidrato', 'carboidratos'),
+    'portion_size': ('portion_size', 'porcao'),
+    'category': ('category', 'categoria', 'grupo'),
+    'average_price': ('average_price', 'preco', 'price', 'preco_medio'),
+    'price_unit': ('price_unit', 'unidade_preco'),
+}
+NUTRIENT_FIELDS = ('calories', 'protein', 'fat', 'carbs')
+# Valores de tabela nutricional que significam "zero": traço, não aplicável etc.
+ZERO_MARKERS = {'tr', 'na', 'nd', '-', '*'}
+
+def iter_csv(stream):
+    yield from csv.DictReader(stream)
+
+def iter_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # Linha inválida vira erro daquela linha, não da carga toda
+                yield ValueError('JSON inválido.')
+
+def iter_json_array(stream, read_size=64 * 1024):
+    """Lê um array JSON objeto a objeto, sem carregar o arquivo inteiro"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if not buffer and not eof:
+                chunk = stream.read(read_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            if not buffer.startswith('['):
+                raise ValueError('Arquivo JSON deve conter uma lista de alimentos.')
+            buffer = buffer[1:]
+            started = True
+            continue
+
+        buffer = buffer.lstrip(', \n\r\t')
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError('Arquivo JSON incompleto.')
+            chunk = stream.read(read_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+def iter_rows(stream, file_format):
+    if file_format == 'csv':
+        return iter_csv(stream)
+    if file_format == 'ndjson':
+        return iter_ndjson(stream)
+    if file_format == 'json':
+        return iter_json_array(stream)
+    raise ValueError(f"Formato não suportado: {file_format}")
+
+def _number(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().lower()
+    if text in ZERO_MARKERS:
+        return 0.0
+    return float(text.replace(',', '.'))
+
+def normalize_row(row):
+    """
+    Converte uma linha do arquivo para colunas de FoodItem, só com os campos
+    presentes: uma lista de preços atualiza apenas average_price.
+    """
+    if isinstance(row, ValueError):
+        raise row
+    lowered = {str(key).strip().lower(): value for key, value in row.items() if key is not None}
+    values = {}
+    for field, aliases in FIELD_ALIASES.items():
+        for alias in aliases:
+            value = lowered.get(alias)
+            if value not in (None, ''):
+                values[field] = value
+                break
+
+    name = str(values.get('name', '')).strip()
+    if not name:
+        raise ValueError('Nome é obrigatório.')
+    values['name'] = name[:100]
+
+    for field in NUTRIENT_FIELDS + ('average_price',):
+        if field in values:
+            try:
+                values[field] = _number(values[field])
+            except ValueError:
+                raise ValueError(f"Valor inválido em '{field}': {values[field]!r}.")
+    if 'calories' in values:
+        values['calories'] = int(round(values['calories']))
+    return values
+
+class FoodLoader:
+    """
+    Carga em lote de FoodItem com upsert por nome.
+    Processa `chunk_size` linhas por vez, cada lote com um SELECT dos nomes
+    existentes, um UPDATE e um INSERT em executemany e seu próprio commit
+    (que também incrementa a versão do catálogo), então a memória não
+    cresce com o tamanho do arquivo.
+    """
+
+    def __init__(self, chunk_size=1000, default_category='outros', default_portion='100g'):
+        self.chunk_size = chunk_size
+        self.default_category = default_category
+        self.default_portion = default_portion
+
+    def load(self, rows):
+        stats = {'rows': 0, 'inserted': 0, 'updated': 0, 'errors': 0, 'error_samples': []}
+        started = time.perf_counter()
+        chunk = {}
+
+        for row_number, row in enumerate(rows, start=1):
+            stats['rows'] += 1
+            try:
+                values = normalize_row(row)
+            except (ValueError, AttributeError) as e:
+                self._error(stats, row_number, e)
+                continue
+            # Nome repetido no mesmo lote: a última linha vence
+            chunk[values['name']] = (row_number, values)
+            if len(chunk) >= self.chunk_size:
+                self._flush(chunk, stats)
+
+        if chunk:
+            self._flush(chunk, stats)
+
+        stats['seconds'] = time.perf_counter() - started
+        stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+        return stats
+
+    def _error(self, stats, row_number, error):
+        stats['errors'] += 1
+        if len(stats['error_samples']) < 20:
+            stats['error_samples'].append({'row': row_number, 'message': str(error)})
+
+    def _flush(self, chunk, stats):
+        existing = dict(
+            db.session.query(FoodItem.name, FoodItem.id).filter(FoodItem.name.in_(list(chunk)))
+        )
+
+        updates, inserts = [], []
+        for name, (row_number, values) in chunk.items():
+            if name in existing:
+                updates.append(dict(values, id=existing[name]))
+            elif all(field in values for field in NUTRIENT_FIELDS):
+                values.setdefault('category', self.default_category)
+                values.setdefault('portion_size', self.default_portion)
+                values.setdefault('average_price', 0.0)
+                values.setdefault('price_unit', 'R$')
+                inserts.append(values)
+            else:
+                self._error(stats, row_number, 'Alimento novo precisa de calorias, proteína, gordura e carboidratos.')
+
+        # UPDATE por chave primária em executemany; as linhas podem ter colunas diferentes
+        for columns in {tuple(sorted(values)) for values in updates}:
+            batch = [values for values in updates if tuple(sorted(values)) == columns]
+            db.session.execute(update(FoodItem), batch)
+        if inserts:
+            db.session.execute(insert(FoodItem), inserts)
+        if updates or inserts:
+            # Na mesma transação do lote: uma carga interrompida ainda
+            # invalida o catálogo dos workers para as linhas já gravadas
+            bump_catalog_version()
+        db.session.commit()
+
+        stats['updated'] += len(updates)
+        stats['inserted'] += len(inserts)
+        chunk.clear()
@@ -0,0 +1,185 @@
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from backend.database import db, FoodItem
+from backend.food_catalog import FOOD_FIELDS, food_catalog, on_food_items_changed
+
+def fold(text):
+    """Minúsculas, sem acentos e com espaços normalizados: 'Pão  Integral' -> 'pao integral'"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.lower().split())
+
+def trigrams(folded):
+    grams = set()
+    for token in folded.split():
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class FoodSearchIndex:
+    """
+    Índice de busca em memória sobre os nomes de FoodItem.
+    Combina uma lista ordenada de tokens (busca por prefixo com bisect) e um
+    índice invertido de trigramas (tolerância a erros de digitação), tudo
+    sobre o texto sem acentos. Alterações no catálogo são aplicadas item a
+    item na próxima busca, sem reconstruir o índice.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    # --- Manutenção ---
+
+    def mark_changed(self, upserted, deleted):
+        with self._lock:
+            if upserted is None:
+                # Mudança feita por outro processo: reconstrói na próxima busca
+                self._reset()
+                return
+            self._pending_upserts |= set(upserted)
+            self._pending_upserts -= set(deleted)
+            self._pending_deletes |= set(deleted)
+
+    def _reset(self):
+        self._loaded = False
+        self._docs = {}
+        self._tokens = []  # (token, food_id) ordenados
+        self._grams = defaultdict(set)
+        self._pending_upserts = set()
+        self._pending_deletes = set()
+
+    def _ensure_fresh(self):
+        food_catalog.check_version()
+        if self._loaded and not self._pending_upserts and not self._pending_deletes:
+            return
+
+        with self._lock:
+            if not self._loaded:
+                for item in db.session.query(FoodItem).all():
+                    self._add(self._doc(item))
+                self._loaded = True
+                self._pending_upserts.clear()
+                self._pending_deletes.clear()
+                return
+
+            for food_id in self._pending_deletes:
+                self._remove(food_id)
+            if self._pending_upserts:
+                items = db.session.query(FoodItem).filter(FoodItem.id.in_(self._pending_upserts)).all()
+                for item in items:
+                    self._remove(item.id)
+                    self._add(self._doc(item))
+            self._pending_upserts.clear()
+            self._pending_deletes.clear()
+
+    @staticmethod
+    def _doc(item):
+        doc = {field: getattr(item, field) for field in FOOD_FIELDS}
+        doc['folded'] = fold(item.name)
+        doc['folded_category'] = fold(item.category)
+        return doc
+
+    def _add(self, doc):
+        food_id = doc['id']
+        self._docs[food_id] = doc
+        for token in set(doc['folded'].split()):
+            insort(self._tokens, (token, food_id))
+        doc['grams'] = trigrams(doc['folded'])
+        for gram in doc['grams']:
+            self._grams[gram].add(food_id)
+
+    def _remove(self, food_id):
+        doc = self._docs.pop(food_id, None)
+        if doc is None:
+            return
+        for token in set(doc['folded'].split()):
+            position = bisect_left(self._tokens, (token, food_id))
+            if position < len(self._tokens) and self._tokens[position] == (token, food_id):
+                del self._tokens[position]
+        for gram in doc['grams']:
+            self._grams[gram].discard(food_id)
+
+    # --- Consulta ---
+
+    def _prefix_matches(self, prefix):
+        matches = set()
+        position = bisect_left(self._tokens, (prefix,))
+        while position < len(self._tokens) and self._tokens[position][0].startswith(prefix):
+            matches.add(self._tokens[position][1])
+            position += 1
+        return matches
+
+    def search(self, query, category=None, min_price=None, max_price=None, limit=10):
+        """Retorna [(score, alimento)] do melhor para o pior resultado"""
+        self._ensure_fresh()
+        with self._lock:
+            return self._search(query, category, min_price, max_price, limit)
+
+    def _search(self, query, category, min_price, max_price, limit):
+        folded = fold(query)
+        if not folded:
+            return []
+        query_tokens = folded.split()
+        query_grams = trigrams(folded)
+        category = fold(category) if category else None
+
+        # Candidatos: prefixo em todos os tokens da busca; trigramas só
+        # entram quando os prefixos não preenchem o limite (erros de digitação)
+        prefix_hits = None
+        for token in query_tokens:
+            hits = self._prefix_matches(token)
+            prefix_hits = hits if prefix_hits is None else prefix_hits & hits
+
+        def accepts(doc):
+            if category and doc['folded_category'] != category:
+                return False
+            price = doc['average_price'] or 0.0
+            if min_price is not None and price < min_price:
+                return False
+            return max_price is None or price <= max_price
+
+        def similarity(doc):
+            return len(query_grams & doc['grams']) / len(query_grams | doc['grams'])
+
+        results = []
+        for food_id in prefix_hits:
+            doc = self._docs[food_id]
+            if not accepts(doc):
+                continue
+            if doc['folded'] == folded:
+                score = 3.0
+            elif doc['folded'].startswith(folded):
+                score = 2.0 + similarity(doc)
+            else:
+                score = 1.0 + similarity(doc)
+            results.append((score, doc))
+
+        if len(results) < limit:
+            shared = defaultdict(int)
+            for gram in query_grams:
+                for food_id in self._grams.get(gram, ()):
+                    shared[food_id] += 1
+            # Limite inferior de similaridade sem montar a união dos conjuntos
+            min_shared = 0.2 * len(query_grams)
+            for food_id, count in shared.items():
+                if count < min_shared or food_id in prefix_hits:
+                    continue
+                doc = self._docs[food_id]
+                if not accepts(doc):
+                    continue
+                score = count / (len(query_grams) + len(doc['grams']) - count)
+                if score >= 0.2:
+                    results.append((score, doc))
+
+        results.sort(key=lambda result: (-result[0], len(result[1]['folded']), result[1]['folded']))
+        return [
+            (round(score, 3), {field: doc[field] for field in FOOD_FIELDS})
+            for score, doc in results[:limit]
+        ]
+
+food_search_index = FoodSearchIndex()
+on_food_items_changed(food_search_index.mark_changed)
@@ -0,0 +1,107 @@
+import os
+import gzip
+import hashlib
+
+from flask import Response, make_response, request
+
+try:
+    import brotli
+except ImportError:  # compressão brotli é opcional
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/csv', 'text/plain', 'text/html'}
+
+def make_etag(*parts):
+    """ETag forte a partir dos componentes da versão do recurso"""
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:24]
+
+def args_fingerprint():
+    """Parâmetros da query em ordem canônica, para entrar na ETag de listagens"""
+    return '&'.join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+
+def _matching_tag(etag):
+    # If-None-Match usa comparação fraca; as variantes comprimidas contam como a mesma versão
+    tags = request.if_none_match
+    for tag in (etag, f"{etag}-gzip", f"{etag}-br"):
+        if tags.contains_weak(tag):
+            return tag
+    return None
+
+def conditional(etag, cache_control, build):
+    """
+    Responde 304 sem chamar `build` quando o cliente já tem a versão `etag`;
+    caso contrário usa a resposta de `build()`. Em ambos os casos envia a
+    ETag e o Cache-Control.
+    """
+    matched = _matching_tag(etag)
+    if matched:
+        # Repete a ETag que o cliente guardou, inclusive a da variante comprimida
+        response = Response(status=304)
+        response.set_etag(matched)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+class ResponseCompressor:
+    """
+    Comprime respostas com brotli (se o pacote estiver instalado) ou gzip,
+    conforme o Accept-Encoding. Respostas pequenas, em streaming ou já
+    codificadas passam direto. A ETag ganha o sufixo da codificação, como
+    exige uma ETag forte para bytes diferentes.
+    """
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=4):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def init_app(self, app):
+        if app.config.get('COMPRESS_RESPONSES', True):
+            app.after_request(self.compress)
+
+    def _choose_encoding(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def compress(self, response):
+        if response.status_code == 304:
+            # A ETag do 304 pode ter o sufixo da codificação; o cache precisa saber disso
+            response.vary.add('Accept-Encoding')
+            return response
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = self._choose_encoding()
+        data = response.get_data()
+        if encoding is None or len(data) < self.min_size:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak=weak)
+        return response
+
+response_compressor = ResponseCompressor(
+    min_size=int(os.environ.get('COMPRESS_MIN_SIZE', 1024)),
+    gzip_level=int(os.environ.get('COMPRESS_GZIP_LEVEL', 6)),
+    brotli_quality=int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+)
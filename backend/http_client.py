@@ -0,0 +1,133 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+def build_session(pool_maxsize=10):
+    """Session com pool de conexões keep-alive, reaproveitada entre requisições"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_maxsize, pool_maxsize=pool_maxsize, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+class CircuitOpenError(Exception):
+    """A chamada remota foi pulada porque o circuito está aberto"""
+
+class CircuitBreaker:
+    """
+    Após `failure_threshold` falhas seguidas o circuito abre e as chamadas
+    são recusadas por `reset_timeout` segundos. Depois disso uma única
+    chamada de teste é liberada (meio-aberto): sucesso fecha o circuito,
+    falha o reabre.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            # Aberto, ou meio-aberto com a chamada de teste em andamento
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+class CallMetrics:
+    """Contadores de resultado e latência de chamadas externas"""
+
+    def __init__(self):
+        self.outcomes = {}
+        self.latency_count = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, outcome, latency=None):
+        with self._lock:
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if latency is not None:
+                self.latency_count += 1
+                self.latency_sum += latency
+                self.latency_max = max(self.latency_max, latency)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'outcomes': dict(self.outcomes),
+                'latency_count': self.latency_count,
+                'latency_sum': self.latency_sum,
+                'latency_max': self.latency_max,
+            }
+
+class ResilientClient:
+    """
+    POST JSON com timeouts de conexão/leitura, circuit breaker e métricas.
+    Lança CircuitOpenError quando o circuito está aberto e
+    requests.RequestException para falhas de rede ou HTTP != 2xx.
+    """
+
+    def __init__(self, connect_timeout=2.0, read_timeout=10.0, breaker=None,
+                 session=None, metrics=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = breaker or CircuitBreaker()
+        self.session = session or build_session()
+        self.metrics = metrics or CallMetrics()
+
+    def post_json(self, url, payload, headers=None, validate=None):
+        """
+        Envia o payload e devolve o JSON da resposta.
+        `validate(json)` pode transformar a resposta; exceções dele contam como falha.
+        """
+        if not self.breaker.allow():
+            self.metrics.record('circuit_open')
+            raise CircuitOpenError(url)
+
+        started = time.perf_counter()
+        try:
+            response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+            result = response.json()
+            if validate is not None:
+                result = validate(result)
+        except requests.Timeout:
+            self._fail('timeout', started)
+            raise
+        except requests.HTTPError:
+            self._fail('http_error', started)
+            raise
+        except Exception:
+            self._fail('error', started)
+            raise
+
+        self.breaker.record_success()
+        self.metrics.record('success', time.perf_counter() - started)
+        return result
+
+    def _fail(self, outcome, started):
+        self.breaker.record_failure()
+        self.metrics.record(outcome, time.perf_counter() - started)
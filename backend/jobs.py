@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import logging
+import uuid
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import update
+
+from backend.database import db, DietJob
+
+logger = logging.getLogger(__name__)
+
+class DietJobWorker:
+    """
+    Executa os DietJob em um pool de threads do próprio processo.
+    A fila é a tabela diet_jobs: cada worker reivindica um job com um
+    UPDATE condicional (status='queued' -> 'running'), então vários
+    processos do gunicorn podem consumir a mesma fila sem broker externo.
+    Jobs presos em 'running' por mais de `stale_after` segundos (worker
+    que morreu) voltam para a fila.
+    """
+
+    def __init__(self, app, run_job, max_workers=2, poll_interval=1.0,
+                 stale_after=600, max_attempts=3):
+        self.app = app
+        self.run_job = run_job
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._finished = threading.Condition()
+        self._slots = None
+        self._executor = None
+
+    # --- Ciclo de vida ---
+
+    def start(self):
+        """Inicia o despachante uma vez por processo (seguro após fork do gunicorn)"""
+        if self.max_workers <= 0 or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._slots = threading.Semaphore(self.max_workers)
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='diet-job')
+            threading.Thread(target=self._dispatch_loop, name='diet-job-dispatcher',
+                             daemon=True).start()
+
+    def submit(self, user_id, payload):
+        """Enfileira um job; quem chama faz o commit e depois chama notify()"""
+        job = DietJob(id=uuid.uuid4().hex, user_id=user_id, payload=json.dumps(payload))
+        db.session.add(job)
+        return job
+
+    def notify(self):
+        self._wakeup.set()
+
+    def wait_for(self, job_id, timeout):
+        """Long-poll: espera o job terminar ou o tempo acabar e devolve o estado atual"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = db.session.get(DietJob, job_id, populate_existing=True)
+            remaining = deadline - time.monotonic()
+            if job is None or job.status in (DietJob.DONE, DietJob.FAILED) or remaining <= 0:
+                return job
+            # Encerra a transação de leitura para enxergar commits de outros processos
+            db.session.rollback()
+            with self._finished:
+                self._finished.wait(min(remaining, 0.5))
+
+    # --- Despacho ---
+
+    def _dispatch_loop(self):
+        last_recovery = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_recovery > self.poll_interval * 30:
+                    self._requeue_stale()
+                    last_recovery = time.monotonic()
+
+                # Só reivindica jobs enquanto houver thread livre no pool
+                while self._slots.acquire(blocking=False):
+                    job_id = self._claim_next()
+                    if job_id is None:
+                        self._slots.release()
+                        break
+                    self._executor.submit(self._run, job_id)
+
+                # Acorda com novo job enfileirado, job terminado ou a cada poll_interval
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+            except Exception:
+                logger.exception("Erro no despachante de jobs de dieta")
+                time.sleep(self.poll_interval)
+
+    def _claim_next(self):
+        with self.app.app_context():
+            while True:
+                candidate = db.session.query(DietJob.id) \
+                    .filter(DietJob.status == DietJob.QUEUED) \
+                    .order_by(DietJob.created_at).limit(1).scalar()
+                if candidate is None:
+                    return None
+
+                claimed = db.session.execute(
+                    update(DietJob)
+                    .where(DietJob.id == candidate, DietJob.status == DietJob.QUEUED)
+                    .values(status=DietJob.RUNNING, started_at=datetime.utcnow(),
+                            attempts=DietJob.attempts + 1)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                db.session.commit()
+                if claimed:
+                    return candidate
+                # Outro processo pegou o mesmo job: tenta o próximo
+
+    def _run(self, job_id):
+        try:
+            with self.app.app_context():
+                job = db.session.get(DietJob, job_id)
+                try:
+                    diet_plan = self.run_job(job.user_id, json.loads(job.payload))
+                    job.diet_plan_id = diet_plan.id
+                    job.status = DietJob.DONE
+                    job.error = None
+                except Exception as e:
+                    logger.exception("Job de dieta %s falhou", job_id)
+                    db.session.rollback()
+                    job = db.session.get(DietJob, job_id)
+                    job.status = DietJob.FAILED
+                    job.error = str(e)[:1000]
+                job.finished_at = datetime.utcnow()
+                db.session.commit()
+        except Exception:
+            logger.exception("Erro ao finalizar job de dieta %s", job_id)
+        finally:
+            self._slots.release()
+            self._wakeup.set()
+            with self._finished:
+                self._finished.notify_all()
+
+    def _requeue_stale(self):
+        limit = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        with self.app.app_context():
+            stale = DietJob.query.filter(DietJob.status == DietJob.RUNNING,
+                                         DietJob.started_at < limit)
+            stale.filter(DietJob.attempts >= self.max_attempts).update(
+                {'status': DietJob.FAILED, 'error': 'Tempo esgotado.',
+                 'finished_at': datetime.utcnow()}, synchronize_session=False)
+            stale.filter(DietJob.attempts < self.max_attempts).update(
+                {'status': DietJob.QUEUED}, synchronize_session=False)
+            db.session.commit()
@@ -0,0 +1,248 @@
+import os
+import time
+import random
+import logging
+import cProfile
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request, Response
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels):
+    labels = [f'{name}="{_escape(value)}"' for name, value in labels]
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+class Histogram:
+    """Histograma cumulativo no formato do Prometheus, por combinação de labels"""
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+            series = [(key, list(counts), count, total) for key, (counts, count, total) in series]
+        for label_values, counts, count, total in series:
+            labels = list(zip(self.label_names, label_values))
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(labels + [('le', bound)])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_labels(labels + [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {total:.6f}")
+        return lines
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            lines.append(f"{self.name}{_labels(zip(self.label_names, label_values))} {value}")
+        return lines
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Provider JSON do Flask que soma o tempo de serialização da requisição"""
+
+    def dumps(self, obj, **kwargs):
+        with request_metrics.section('serialize'):
+            return super().dumps(obj, **kwargs)
+
+class RequestMetrics:
+    """
+    Métricas por requisição para o Flask: latência por rota, consultas SQL
+    (contagem e duração via eventos do SQLAlchemy), tempo por etapa
+    (`section`: jwt, serialização...) e log de requisições lentas, com
+    dump opcional do cProfile. Os valores são por processo: com vários
+    workers do gunicorn cada um expõe os seus em /metrics.
+    """
+
+    def __init__(self):
+        self.request_latency = Histogram(
+            'http_request_duration_seconds', 'Latência das requisições HTTP.',
+            ('method', 'endpoint', 'status'))
+        self.request_sql = Histogram(
+            'http_request_sql_queries', 'Consultas SQL por requisição.',
+            ('endpoint',), buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+        self.section_latency = Histogram(
+            'http_request_section_duration_seconds', 'Tempo por etapa dentro da requisição.',
+            ('endpoint', 'section'))
+        self.sql_latency = Histogram(
+            'sql_query_duration_seconds', 'Duração das consultas SQL.', ('statement',))
+        self.slow_requests = Counter(
+            'http_slow_requests_total', 'Requisições acima do limite de lentidão.', ('endpoint',))
+        self.collectors = []
+
+        self.slow_threshold = 0.5
+        self.profile_rate = 0.0
+        self.profile_dir = None
+        self._profile_lock = threading.Lock()
+
+    # --- Integração ---
+
+    def init_app(self, app):
+        self.slow_threshold = app.config.get('SLOW_REQUEST_MS', 500) / 1000.0
+        self.profile_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+        self.profile_dir = app.config.get('PROFILE_DIR')
+
+        app.json = TimedJSONProvider(app)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+        # No Engine (classe) vale para todo engine criado, inclusive o do Flask-SQLAlchemy
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    def register_collector(self, collector):
+        """`collector()` devolve linhas extras no formato de texto do Prometheus"""
+        self.collectors.append(collector)
+        return collector
+
+    @contextmanager
+    def section(self, name):
+        """Soma o tempo do bloco na etapa `name` da requisição atual"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if has_request_context() and 'metrics_started' in g:
+                sections = g.metrics_sections
+                sections[name] = sections.get(name, 0.0) + time.perf_counter() - started
+
+    # --- Ciclo da requisição ---
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_count = 0
+        g.metrics_sql_time = 0.0
+        g.metrics_sections = {}
+        g.metrics_profiler = None
+        if self.profile_rate and random.random() < self.profile_rate \
+                and self._profile_lock.acquire(blocking=False):
+            # Um profiler ativo por vez: o cProfile não aceita dois simultâneos
+            g.metrics_profiler = cProfile.Profile()
+            g.metrics_profiler.enable()
+
+    def _after_request(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _teardown_request(self, error=None):
+        if 'metrics_started' not in g:
+            return
+        elapsed = time.perf_counter() - g.metrics_started
+        profiler = g.pop('metrics_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            self._profile_lock.release()
+
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        status = g.get('metrics_status', 500)
+        self.request_latency.observe(elapsed, request.method, endpoint, status)
+        self.request_sql.observe(g.metrics_sql_count, endpoint)
+        sections = dict(g.metrics_sections, sql=g.metrics_sql_time)
+        for name, seconds in sections.items():
+            self.section_latency.observe(seconds, endpoint, name)
+
+        if elapsed >= self.slow_threshold:
+            self.slow_requests.inc(endpoint)
+            breakdown = ', '.join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in sorted(sections.items()))
+            logger.warning("Requisição lenta: %s %s -> %s em %.1fms (%d consultas SQL; %s)",
+                           request.method, request.path, status, elapsed * 1000,
+                           g.metrics_sql_count, breakdown)
+            if profiler is not None and self.profile_dir:
+                self._dump_profile(profiler, endpoint)
+        del g.metrics_started
+
+    def _dump_profile(self, profiler, endpoint):
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            name = endpoint.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root'
+            path = os.path.join(self.profile_dir, f"{name}-{int(time.time() * 1000)}.prof")
+            profiler.dump_stats(path)
+            logger.warning("Perfil da requisição lenta salvo em %s", path)
+        except OSError:
+            logger.exception("Não foi possível salvar o perfil da requisição")
+
+    # --- Exposição ---
+
+    def render(self):
+        lines = []
+        for metric in (self.request_latency, self.request_sql, self.section_latency,
+                       self.sql_latency, self.slow_requests):
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                lines.extend(collector())
+            except Exception:
+                logger.exception("Falha em coletor de métricas")
+        return '\n'.join(lines) + '\n'
+
+    def response(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # No contexto da execução, não na conexão: se o statement falha o
+    # after_cursor_execute não roda, e o início some junto com o contexto
+    if context is not None:
+        context._metrics_query_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    words = statement.lstrip().split(None, 1)
+    kind = words[0].upper() if words else ''
+    if kind not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE'):
+        kind = 'OTHER'
+    request_metrics.sql_latency.observe(elapsed, kind)
+    if has_request_context() and 'metrics_started' in g:
+        g.metrics_sql_count += 1
+        g.metrics_sql_time += elapsed
+
+def gauge_lines(name, help_text, value, metric_type='gauge'):
+    """Linhas de uma métrica simples, para os coletores"""
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+
+request_metrics = RequestMetrics()
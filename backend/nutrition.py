@@ -0,0 +1,139 @@
+import os
+
+import numpy as np
+
+# Fórmulas de metabolismo basal suportadas
+MIFFLIN_ST_JEOR = 'mifflin_st_jeor'
+HARRIS_BENEDICT = 'harris_benedict'
+FORMULAS = (MIFFLIN_ST_JEOR, HARRIS_BENEDICT)
+DEFAULT_FORMULA = os.environ.get('NUTRITION_FORMULA', MIFFLIN_ST_JEOR)
+
+# Piso da meta calórica, o mesmo aplicado no Front-end
+MIN_CALORIES = float(os.environ.get('NUTRITION_MIN_CALORIES', 1200))
+
+ACTIVITY_FACTORS = {
+    'sedentary': 1.2, 'light': 1.375, 'moderate': 1.55,
+    'active': 1.725, 'very_active': 1.9
+}
+GOAL_ADJUSTMENTS = {'weight_loss': -500, 'maintain': 0, 'gain_muscle': 300}
+
+# Distribuição de macros (proteína, carboidrato, gordura) em % das calorias por objetivo
+GOAL_MACRO_RATIOS = {
+    'weight_loss': (0.35, 0.40, 0.25),
+    'maintain': (0.25, 0.50, 0.25),
+    'gain_muscle': (0.30, 0.50, 0.20),
+}
+
+CALORIES_PER_GRAM = {'protein': 4, 'carbs': 4, 'fat': 9}
+MACROS = ('protein', 'carbs', 'fat')
+
+# Rótulos do formulário do Front-end (dieta_facil.html) -> chaves da API
+GENDER_ALIASES = {
+    'male': 'male', 'masculino': 'male', 'm': 'male',
+    'female': 'female', 'feminino': 'female', 'f': 'female',
+}
+ACTIVITY_ALIASES = {
+    'sedentário': 'sedentary', 'sedentario': 'sedentary',
+    'levemente ativo': 'light',
+    'moderadamente ativo': 'moderate',
+    'muito ativo': 'active',
+    'extremamente ativo': 'very_active',
+}
+GOAL_ALIASES = {
+    'perder peso': 'weight_loss',
+    'manter peso': 'maintain',
+    'ganhar massa muscular': 'gain_muscle',
+}
+
+def _canonical(value, choices, aliases, field):
+    key = str(value).strip().lower()
+    if key in choices:
+        return key
+    if key in aliases:
+        return aliases[key]
+    raise ValueError(f"Valor inválido em '{field}': {value!r}.")
+
+def canonical_gender(value):
+    return _canonical(value, ('male', 'female'), GENDER_ALIASES, 'gender')
+
+def canonical_activity(value):
+    return _canonical(value, ACTIVITY_FACTORS, ACTIVITY_ALIASES, 'activityLevel')
+
+def canonical_goal(value):
+    return _canonical(value, GOAL_ADJUSTMENTS, GOAL_ALIASES, 'goal')
+
+def normalize_profile(profile):
+    """Converte rótulos em português ou inglês para as chaves da API ou lança ValueError"""
+    normalized = dict(profile)
+    normalized['gender'] = canonical_gender(profile['gender'])
+    normalized['activityLevel'] = canonical_activity(profile['activityLevel'])
+    normalized['goal'] = canonical_goal(profile['goal'])
+    return normalized
+
+def macro_targets(calories, goal):
+    """Gramas de proteína, carboidrato e gordura para a meta calórica"""
+    ratios = GOAL_MACRO_RATIOS.get(GOAL_ALIASES.get(str(goal).strip().lower(), goal),
+                                   GOAL_MACRO_RATIOS['maintain'])
+    return {
+        macro: calories * ratio / CALORIES_PER_GRAM[macro]
+        for macro, ratio in zip(MACROS, ratios)
+    }
+
+def compute_targets(profiles, formula=None):
+    """
+    Calcula BMR, TDEE, meta calórica e macros de vários perfis de uma vez.
+    Os perfis precisam estar normalizados (normalize_profile); a conta é
+    feita em vetores NumPy, então o custo por perfil é só a montagem das
+    colunas. Devolve um dict de arrays na ordem dos perfis.
+    """
+    formula = formula or DEFAULT_FORMULA
+    if formula not in FORMULAS:
+        raise ValueError(f"Fórmula desconhecida: {formula}.")
+
+    count = len(profiles)
+    weight = np.fromiter((p['weight'] for p in profiles), dtype=float, count=count)
+    height = np.fromiter((p['height'] for p in profiles), dtype=float, count=count)
+    age = np.fromiter((p['age'] for p in profiles), dtype=float, count=count)
+    male = np.fromiter((p['gender'] == 'male' for p in profiles), dtype=bool, count=count)
+    factor = np.fromiter((ACTIVITY_FACTORS[p['activityLevel']] for p in profiles), dtype=float, count=count)
+    adjustment = np.fromiter((GOAL_ADJUSTMENTS[p['goal']] for p in profiles), dtype=float, count=count)
+    ratios = np.array([GOAL_MACRO_RATIOS[p['goal']] for p in profiles], dtype=float).reshape(count, 3)
+
+    if formula == MIFFLIN_ST_JEOR:
+        bmr = 10 * weight + 6.25 * height - 5 * age + np.where(male, 5.0, -161.0)
+    else:
+        # Harris-Benedict revisada (Roza & Shizgal), a usada no Front-end
+        bmr = np.where(
+            male,
+            88.362 + 13.397 * weight + 4.799 * height - 5.677 * age,
+            447.593 + 9.247 * weight + 3.098 * height - 4.330 * age
+        )
+
+    tdee = bmr * factor
+    target = np.maximum(tdee + adjustment, MIN_CALORIES)
+    grams = target[:, None] * ratios / np.array([CALORIES_PER_GRAM[macro] for macro in MACROS])
+
+    return {
+        'bmr': bmr,
+        'tdee': tdee,
+        'target_calories': target,
+        'protein': grams[:, 0],
+        'carbs': grams[:, 1],
+        'fat': grams[:, 2],
+    }
+
+def targets_as_dicts(targets):
+    """Converte o resultado de compute_targets em uma lista de dicts arredondados"""
+    columns = {
+        'bmr': np.rint(targets['bmr']).astype(int).tolist(),
+        'tdee': np.rint(targets['tdee']).astype(int).tolist(),
+        'target_calories': np.rint(targets['target_calories']).astype(int).tolist(),
+    }
+    for macro in MACROS:
+        columns[macro] = np.round(targets[macro], 1).tolist()
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+def calculate_targets(profile, formula=None):
+    """Metas de um único perfil (aceita rótulos em português ou inglês), sem arredondamento"""
+    targets = compute_targets([normalize_profile(profile)], formula)
+    return {field: float(values[0]) for field, values in targets.items()}
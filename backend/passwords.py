@@ -0,0 +1,174 @@
+import os
+import hmac
+import base64
+import hashlib
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import argon2
+except ImportError:  # argon2-cffi é opcional
+    argon2 = None
+
+PBKDF2 = 'pbkdf2_sha256'
+SCRYPT = 'scrypt'
+ARGON2 = 'argon2'
+ALGORITHMS = (PBKDF2, SCRYPT, ARGON2)
+
+def _b64(raw):
+    return base64.b64encode(raw).decode('ascii').rstrip('=')
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+def _gevent_threadpool():
+    """Pool de threads nativas do gevent quando o threading foi monkey-patched"""
+    try:
+        from gevent import get_hub, monkey
+    except ImportError:
+        return None
+    return get_hub().threadpool if monkey.is_module_patched('threading') else None
+
+class PasswordHasher:
+    """
+    Hash de senhas com algoritmo e custo configuráveis.
+
+    Formatos gravados:
+        pbkdf2_sha256$<iterações>$<salt>$<hash>
+        scrypt$<n>$<r>$<p>$<salt>$<hash>
+        $argon2id$...   (formato do argon2-cffi)
+
+    Hashes com parâmetros diferentes dos atuais continuam válidos e
+    `needs_rehash` indica quando regravá-los; valores sem formato
+    reconhecido são senhas antigas em texto puro. O cálculo roda em um
+    pool de threads limitado (hashlib libera o GIL), então logins
+    simultâneos não ocupam todos os núcleos nem travam workers gevent.
+    """
+
+    def __init__(self, algorithm=SCRYPT, pbkdf2_iterations=600000, scrypt_n=2 ** 14,
+                 scrypt_r=8, scrypt_p=1, argon2_time_cost=3, argon2_memory_cost=65536,
+                 argon2_parallelism=1, max_workers=None):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Algoritmo de senha desconhecido: {algorithm}.")
+        if algorithm == ARGON2 and argon2 is None:
+            raise ValueError('PASSWORD_HASH_ALGORITHM=argon2 requer o pacote argon2-cffi.')
+        if algorithm == SCRYPT and not hasattr(hashlib, 'scrypt'):
+            algorithm = PBKDF2  # OpenSSL sem scrypt
+
+        self.algorithm = algorithm
+        self.pbkdf2_iterations = pbkdf2_iterations
+        self.scrypt_n = scrypt_n
+        self.scrypt_r = scrypt_r
+        self.scrypt_p = scrypt_p
+        self._argon2 = argon2.PasswordHasher(
+            time_cost=argon2_time_cost, memory_cost=argon2_memory_cost, parallelism=argon2_parallelism
+        ) if argon2 is not None else None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                                            thread_name_prefix='password-hash')
+        # Usado quando o email não existe, para o tempo de resposta não revelar isso
+        self._dummy = None
+
+    # --- API pública (roda no pool) ---
+
+    def hash(self, password):
+        return self._offload(self._hash, password)
+
+    def verify(self, stored, password):
+        """Compara em tempo constante; aceita qualquer formato conhecido ou texto puro"""
+        return self._offload(self._verify, stored, password)
+
+    def verify_dummy(self, password):
+        if self._dummy is None:
+            self._dummy = self._hash(secrets.token_hex(16))
+        self.verify(self._dummy, password)
+        return False
+
+    def map_hash(self, passwords):
+        """Hash de vários valores em paralelo, na ordem de entrada"""
+        return list(self._executor.map(self._hash, passwords))
+
+    def needs_rehash(self, stored):
+        """Texto puro, outro algoritmo ou custo diferente do configurado"""
+        if self.algorithm == ARGON2:
+            if not stored.startswith('$argon2'):
+                return True
+            return self._argon2.check_needs_rehash(stored)
+
+        parts = stored.split('$')
+        if self.algorithm == PBKDF2:
+            return not (len(parts) == 4 and parts[0] == PBKDF2 and parts[1] == str(self.pbkdf2_iterations))
+        return not (len(parts) == 6 and parts[0] == SCRYPT and
+                    parts[1:4] == [str(self.scrypt_n), str(self.scrypt_r), str(self.scrypt_p)])
+
+    @staticmethod
+    def is_hashed(stored):
+        return stored.startswith((PBKDF2 + '$', SCRYPT + '$', '$argon2'))
+
+    # --- Implementação ---
+
+    def _offload(self, fn, *args):
+        threadpool = _gevent_threadpool()
+        if threadpool is not None:
+            return threadpool.spawn(fn, *args).get()
+        return self._executor.submit(fn, *args).result()
+
+    def _hash(self, password):
+        secret = password.encode('utf-8')
+        if self.algorithm == ARGON2:
+            return self._argon2.hash(secret)
+        salt = secrets.token_bytes(16)
+        if self.algorithm == PBKDF2:
+            digest = hashlib.pbkdf2_hmac('sha256', secret, salt, self.pbkdf2_iterations)
+            return f"{PBKDF2}${self.pbkdf2_iterations}${_b64(salt)}${_b64(digest)}"
+        digest = self._scrypt(secret, salt, self.scrypt_n, self.scrypt_r, self.scrypt_p)
+        return f"{SCRYPT}${self.scrypt_n}${self.scrypt_r}${self.scrypt_p}${_b64(salt)}${_b64(digest)}"
+
+    @staticmethod
+    def _scrypt(secret, salt, n, r, p):
+        # maxmem acima do padrão do OpenSSL (32 MB) para permitir custos maiores
+        return hashlib.scrypt(secret, salt=salt, n=n, r=r, p=p, dklen=64,
+                              maxmem=max(64 * 1024 * 1024, 256 * n * r))
+
+    def _verify(self, stored, password):
+        if not stored or password is None:
+            return False
+        secret = password.encode('utf-8')
+
+        if stored.startswith('$argon2'):
+            if argon2 is None:
+                return False
+            try:
+                return self._argon2.verify(stored, secret)
+            except (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHashError):
+                return False
+
+        parts = stored.split('$')
+        try:
+            if parts[0] == PBKDF2 and len(parts) == 4:
+                expected = _unb64(parts[3])
+                digest = hashlib.pbkdf2_hmac('sha256', secret, _unb64(parts[2]), int(parts[1]))
+                return hmac.compare_digest(digest, expected)
+            if parts[0] == SCRYPT and len(parts) == 6:
+                expected = _unb64(parts[5])
+                digest = self._scrypt(secret, _unb64(parts[4]), int(parts[1]), int(parts[2]), int(parts[3]))
+                return hmac.compare_digest(digest, expected)
+        except (ValueError, TypeError):
+            return False
+
+        # Senha antiga gravada em texto puro
+        return hmac.compare_digest(stored.encode('utf-8'), secret)
+
+def hasher_from_env():
+    return PasswordHasher(
+        algorithm=os.environ.get('PASSWORD_HASH_ALGORITHM', SCRYPT),
+        pbkdf2_iterations=int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 600000)),
+        scrypt_n=int(os.environ.get('PASSWORD_SCRYPT_N', 2 ** 14)),
+        scrypt_r=int(os.environ.get('PASSWORD_SCRYPT_R', 8)),
+        scrypt_p=int(os.environ.get('PASSWORD_SCRYPT_P', 1)),
+        argon2_time_cost=int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 3)),
+        argon2_memory_cost=int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 65536)),
+        argon2_parallelism=int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 1)),
+        max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 0)) or None
+    )
+
+password_hasher = hasher_from_env()
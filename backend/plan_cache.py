@@ -0,0 +1,82 @@
+import os
+import math
+
+from backend.cache import TTLCache
+from backend.food_catalog import on_food_items_changed
+
+class PlanCache:
+    """
+    Cache LRU de planos de dieta por perfil normalizado.
+    Peso, altura, idade e orçamento são arredondados em faixas (o orçamento
+    sempre para baixo), e o plano é gerado a partir do perfil já
+    normalizado, então todos os usuários da mesma faixa recebem exatamente
+    o mesmo plano. A versão do catálogo
+    entra na chave: mudar preços gera chaves novas.
+    """
+
+    def __init__(self, maxsize=2048, ttl=6 * 3600, weight_step=1.0, height_step=1.0,
+                 age_step=1.0, budget_step=10.0):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.weight_step = weight_step
+        self.height_step = height_step
+        self.age_step = age_step
+        self.budget_step = budget_step
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _bucket(value, step):
+        return round(round(float(value) / step) * step, 2)
+
+    @staticmethod
+    def _bucket_down(value, step):
+        # Orçamento arredonda para baixo: o plano nunca passa do valor informado
+        return round(math.floor(float(value) / step) * step, 2)
+
+    def normalize(self, profile, monthly_budget):
+        """Retorna (perfil, orçamento) arredondados às faixas do cache"""
+        normalized = {
+            'age': self._bucket(profile['age'], self.age_step),
+            'weight': self._bucket(profile['weight'], self.weight_step),
+            'height': self._bucket(profile['height'], self.height_step),
+            'gender': str(profile['gender']).strip().lower(),
+            'goal': str(profile['goal']).strip().lower(),
+            'activityLevel': str(profile['activityLevel']).strip().lower(),
+        }
+        return normalized, self._bucket_down(monthly_budget, self.budget_step)
+
+    def key(self, normalized_profile, monthly_budget, catalog_version, seed=0):
+        return (
+            catalog_version, seed, monthly_budget,
+            tuple(sorted(normalized_profile.items()))
+        )
+
+    def get_or_generate(self, profile, monthly_budget, catalog, generate, seed=0):
+        """
+        Devolve (plano, veio_do_cache).
+        `generate(perfil_normalizado, orçamento_normalizado)` só é chamado no miss.
+        """
+        normalized, budget = self.normalize(profile, monthly_budget)
+        key = self.key(normalized, budget, catalog.version, seed)
+
+        plan = self.cache.get(key)
+        if plan is not None:
+            self.hits += 1
+            return plan, True
+
+        self.misses += 1
+        plan = generate(normalized, budget)
+        self.cache.set(key, plan)
+        return plan, False
+
+    def clear(self):
+        self.cache.clear()
+
+plan_cache = PlanCache(
+    maxsize=int(os.environ.get('PLAN_CACHE_SIZE', 2048)),
+    ttl=int(os.environ.get('PLAN_CACHE_TTL', 6 * 3600)),
+    budget_step=float(os.environ.get('PLAN_CACHE_BUDGET_STEP', 10.0))
+)
+
+# Planos antigos nunca mais seriam lidos após mudança no catálogo: libera a memória
+on_food_items_changed(lambda upserted, deleted: plan_cache.clear())
@@ -0,0 +1,41 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Limite de `limit` chamadas por `period` segundos por chave (token bucket).
+    O estado fica na memória do worker, então com N processos do gunicorn o
+    limite efetivo por usuário é até N vezes maior.
+    """
+
+    def __init__(self, limit, period, maxsize=100000):
+        self.limit = limit
+        self.period = period
+        self.maxsize = maxsize
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Consome uma chamada; devolve 0 se liberada ou os segundos até a próxima"""
+        if self.limit <= 0:
+            return 0.0
+        rate = self.limit / self.period
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.limit, now))
+            tokens = min(self.limit, tokens + (now - updated_at) * rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / rate
+            if key not in self._buckets and len(self._buckets) >= self.maxsize:
+                self._prune(now, rate)
+            self._buckets[key] = (tokens - 1, now)
+            return 0.0
+
+    def _prune(self, now, rate):
+        # Baldes já cheios de novo equivalem a não ter estado nenhum
+        full = [key for key, (tokens, updated_at) in self._buckets.items()
+                if tokens + (now - updated_at) * rate >= self.limit]
+        for key in full:
+            del self._buckets[key]
@@ -0,0 +1,420 @@
+"""
+Benchmark de carga das rotas da API.
+
+Cria N usuários com M despesas e registros alimentares cada e exercita
+registro, login, perfil, CRUD/listagem de despesas e geração de dieta,
+reportando vazão e latência p50/p95/p99 por rota. Roda o app no próprio
+processo (test client do Flask), sob um gunicorn iniciado pelo script ou
+contra uma URL já no ar.
+
+    python -m benchmarks.api_bench --users 20 --expenses 500 --requests 300
+    python -m benchmarks.api_bench --gunicorn --gunicorn-args "--workers 2"
+    python -m benchmarks.api_bench --url http://127.0.0.1:8000
+
+Baselines ficam em benchmarks/baselines/<nome>.json:
+
+    python -m benchmarks.api_bench --save-baseline sqlite-inprocess
+    python -m benchmarks.api_bench --compare sqlite-inprocess --tolerance 0.25
+
+Com --compare o processo sai com código 1 se o percentil escolhido
+(--metric, padrão p95) de alguma rota piorar além da tolerância.
+"""
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+
+GENDERS = ('male', 'female')
+ACTIVITY_LEVELS = ('sedentary', 'light', 'moderate', 'active', 'very_active')
+GOALS = ('weight_loss', 'maintain', 'gain_muscle')
+FOOD_QUERIES = ('arroz', 'feijao', 'frango', 'ovo', 'banana', 'leite', 'pao', 'aveia')
+
+# --- Clientes ---
+
+class InProcessClient:
+    """Chama o app WSGI direto pelo test client do Flask (um por thread)"""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, json_body=None, token=None, data=None, content_type=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        headers = {'Authorization': f"Bearer {token}"} if token else {}
+        response = client.open(path, method=method, json=json_body, data=data,
+                               headers=headers, content_type=content_type)
+        return response.status_code, response.get_json(silent=True)
+
+class HttpClient:
+    """Requisições HTTP reais, com uma Session keep-alive por thread"""
+
+    def __init__(self, base_url):
+        import requests
+        self._requests = requests
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+        self._sessions = []
+
+    def request(self, method, path, json_body=None, token=None, data=None, content_type=None):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+            self._sessions.append(session)
+        headers = {'Authorization': f"Bearer {token}"} if token else {}
+        if content_type:
+            headers['Content-Type'] = content_type
+        response = session.request(method, self.base_url + path, json=json_body,
+                                   data=data.encode('utf-8') if isinstance(data, str) else data,
+                                   headers=headers, timeout=60)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        return response.status_code, body
+
+    def close(self):
+        # Conexões keep-alive abertas seguram o desligamento gracioso do gunicorn
+        for session in self._sessions:
+            session.close()
+
+# --- Massa de dados ---
+
+def random_profile(rng):
+    return {
+        'age': rng.randint(18, 70),
+        'weight': round(rng.uniform(50, 110), 1),
+        'height': rng.randint(150, 195),
+        'gender': rng.choice(GENDERS),
+        'activityLevel': rng.choice(ACTIVITY_LEVELS),
+        'goal': rng.choice(GOALS),
+    }
+
+def random_day(rng):
+    return (datetime.date.today() - datetime.timedelta(days=rng.randint(0, 365))).isoformat()
+
+def create_account(client, email, rng):
+    password = 'senha-bench'
+    status, body = client.request('POST', '/api/register', {
+        'email': email, 'password': password, 'monthly_budget': rng.choice([300, 450, 600, 900])
+    })
+    if status != 201:
+        raise RuntimeError(f"Falha ao registrar {email}: {status} {body}")
+    return {'email': email, 'password': password, 'token': body['token'], 'expense_ids': []}
+
+def seed(client, run_id, users, expenses, food_entries, rng):
+    food_ids = set()
+    for query in FOOD_QUERIES:
+        status, body = client.request('GET', f"/api/foods/search?q={query}&limit=5")
+        if status == 200:
+            food_ids.update(food['id'] for food in body)
+    food_ids = sorted(food_ids)
+
+    accounts = []
+    for i in range(users):
+        account = create_account(client, f"bench-{run_id}-{i}@example.com", rng)
+        if expenses:
+            rows = '\n'.join(json.dumps({
+                'description': f"despesa {j}", 'amount': round(rng.uniform(1, 200), 2),
+                'date_incurred': random_day(rng)
+            }) for j in range(expenses))
+            status, body = client.request('POST', '/api/expenses/bulk', token=account['token'],
+                                          data=rows, content_type='application/x-ndjson')
+            if status != 201:
+                raise RuntimeError(f"Falha na carga de despesas: {status} {body}")
+        for _ in range(food_entries if food_ids else 0):
+            client.request('POST', '/api/food-entries', {
+                'food_id': rng.choice(food_ids), 'quantity': rng.choice([0.5, 1, 1.5, 2]),
+                'meal_type': rng.choice(['cafe', 'almoco', 'jantar', 'lanche']),
+                'date': random_day(rng)
+            }, token=account['token'])
+        accounts.append(account)
+    return accounts
+
+# --- Cenários ---
+
+def build_scenarios(client, accounts, run_id):
+    """(nome da rota, status esperados, função(i, rng) -> status)"""
+    counter = iter(range(10 ** 9))
+    counter_lock = threading.Lock()
+
+    def account_for(i):
+        return accounts[i % len(accounts)]
+
+    def register(i, rng):
+        with counter_lock:
+            n = next(counter)
+        status, _ = client.request('POST', '/api/register', {
+            'email': f"bench-{run_id}-new-{n}@example.com", 'password': 'senha-bench', 'monthly_budget': 500
+        })
+        return status
+
+    def login(i, rng):
+        account = account_for(i)
+        status, _ = client.request('POST', '/api/login', {'email': account['email'], 'password': account['password']})
+        return status
+
+    def profile(i, rng):
+        return client.request('GET', '/api/profile', token=account_for(i)['token'])[0]
+
+    def expenses_list(i, rng):
+        return client.request('GET', '/api/expenses?limit=50', token=account_for(i)['token'])[0]
+
+    def expense_create(i, rng):
+        account = account_for(i)
+        status, body = client.request('POST', '/api/expenses', {
+            'description': 'bench', 'amount': round(rng.uniform(1, 100), 2), 'date_incurred': random_day(rng)
+        }, token=account['token'])
+        if status == 201:
+            account['expense_ids'].append(body['expense']['id'])
+        return status
+
+    def created_expense(i):
+        account = account_for(i)
+        ids = account['expense_ids']
+        return account, ids[(i // len(accounts)) % len(ids)] if ids else 0
+
+    def expense_get(i, rng):
+        account, expense_id = created_expense(i)
+        return client.request('GET', f"/api/expenses/{expense_id}", token=account['token'])[0]
+
+    def expense_update(i, rng):
+        account, expense_id = created_expense(i)
+        return client.request('PUT', f"/api/expenses/{expense_id}",
+                              {'amount': round(rng.uniform(1, 100), 2)}, token=account['token'])[0]
+
+    def expense_delete(i, rng):
+        account = account_for(i)
+        try:
+            expense_id = account['expense_ids'].pop()
+        except IndexError:
+            expense_id = 0
+        return client.request('DELETE', f"/api/expenses/{expense_id}", token=account['token'])[0]
+
+    def expenses_summary(i, rng):
+        return client.request('GET', '/api/expenses/summary', token=account_for(i)['token'])[0]
+
+    def diet_plan(i, rng):
+        return client.request('POST', '/api/diet/plan', dict(random_profile(rng), seed=rng.randint(0, 3)),
+                              token=account_for(i)['token'])[0]
+
+    return [
+        ('POST /api/register', {201}, register),
+        ('POST /api/login', {200}, login),
+        ('GET /api/profile', {200}, profile),
+        ('GET /api/expenses', {200}, expenses_list),
+        ('POST /api/expenses', {201}, expense_create),
+        ('GET /api/expenses/<id>', {200}, expense_get),
+        ('PUT /api/expenses/<id>', {200}, expense_update),
+        ('GET /api/expenses/summary', {200}, expenses_summary),
+        ('DELETE /api/expenses/<id>', {200}, expense_delete),
+        ('POST /api/diet/plan', {200}, diet_plan),
+    ]
+
+# --- Execução e relatório ---
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def run_scenario(fn, expected, requests, concurrency, seed, warmup=0):
+    # Aquecimento fora da medição: caches, pool de conexões, JIT do SQLite
+    for i in range(warmup):
+        try:
+            fn(requests + i, random.Random(seed * 1000003 + requests + i))
+        except Exception:
+            pass
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        rng = random.Random(seed * 1000003 + i)
+        started = time.perf_counter()
+        try:
+            status = fn(i, rng)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if status not in expected:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'rps': round(requests / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+def print_report(results):
+    print(f"{'rota':<28}{'req':>7}{'erros':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, stats in results.items():
+        print(f"{route:<28}{stats['requests']:>7}{stats['errors']:>7}{stats['rps']:>9.1f}"
+              f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}")
+
+def compare(results, baseline, metric, tolerance, min_delta_ms):
+    """Lista as rotas cuja métrica piorou além da tolerância em relação à baseline"""
+    regressions = []
+    for route, stats in results.items():
+        before = baseline['routes'].get(route)
+        if before is None:
+            continue
+        limit = before[metric] * (1 + tolerance)
+        if stats[metric] > limit and stats[metric] - before[metric] >= min_delta_ms:
+            regressions.append((route, before[metric], stats[metric]))
+    return regressions
+
+def baseline_path(name):
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+# --- Alvos ---
+
+def in_process_client(database_url):
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('DIET_JOB_WORKERS', '0')
+    os.environ.setdefault('SLOW_REQUEST_MS', '60000')
+    app = importlib.import_module('app').app
+    importlib.import_module('backend.database').init_db(app)
+    return InProcessClient(app)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_gunicorn(database_url, extra_args):
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=database_url, SLOW_REQUEST_MS='60000')
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], env=env, cwd=cwd, check=True)
+    command = [sys.executable, '-m', 'gunicorn', '--bind', f"127.0.0.1:{port}"] + shlex.split(extra_args) + ['app:app']
+    process = subprocess.Popen(command, env=env, cwd=cwd)
+    client = HttpClient(f"http://127.0.0.1:{port}")
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn terminou durante a inicialização.')
+        try:
+            if client.request('GET', '/')[0] == 200:
+                return process, client
+        except Exception:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn não respondeu em 30s.')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--expenses', type=int, default=200, help='Despesas por usuário na carga inicial.')
+    parser.add_argument('--food-entries', type=int, default=20, help='Registros alimentares por usuário.')
+    parser.add_argument('--requests', type=int, default=200, help='Requisições por rota.')
+    parser.add_argument('--concurrency', type=int,
+                        help='Threads do cliente (padrão: 1 no modo local, onde o GIL serializa tudo; 8 via HTTP).')
+    parser.add_argument('--warmup', type=int, default=20, help='Requisições não medidas por rota.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--url', help='Testa uma API já no ar em vez do app local.')
+    parser.add_argument('--gunicorn', action='store_true', help='Sobe o app sob gunicorn para o teste.')
+    parser.add_argument('--gunicorn-args', default='--workers 2', help='Argumentos extras do gunicorn.')
+    parser.add_argument('--routes', help='Filtra rotas por trecho do nome, separados por vírgula.')
+    parser.add_argument('--save-baseline', metavar='NOME')
+    parser.add_argument('--compare', metavar='NOME')
+    parser.add_argument('--metric', choices=['p50_ms', 'p95_ms', 'p99_ms'], default='p95_ms',
+                        help='Percentil usado na comparação com a baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Piora relativa aceita.')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0, help='Piora absoluta mínima para contar.')
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='api-bench-'), 'bench.db')}"
+    if database_url.startswith('postgres://'):
+        database_url = database_url.replace('postgres://', 'postgresql://', 1)
+
+    process = None
+    if args.url:
+        mode, client = 'url', HttpClient(args.url)
+    elif args.gunicorn:
+        mode = 'gunicorn'
+        process, client = start_gunicorn(database_url, args.gunicorn_args)
+    else:
+        mode, client = 'in-process', in_process_client(database_url)
+    concurrency = args.concurrency or (1 if mode == 'in-process' else 8)
+
+    try:
+        rng = random.Random(args.seed)
+        run_id = f"{int(time.time())}-{os.getpid()}"
+        started = time.perf_counter()
+        accounts = seed(client, run_id, args.users, args.expenses, args.food_entries, rng)
+        print(f"Modo: {mode}; carga inicial de {args.users} usuários em {time.perf_counter() - started:.1f}s")
+
+        filters = [part.strip() for part in args.routes.split(',')] if args.routes else None
+        results = {}
+        for index, (route, expected, fn) in enumerate(build_scenarios(client, accounts, run_id)):
+            if filters and not any(part in route for part in filters):
+                continue
+            results[route] = run_scenario(fn, expected, args.requests, concurrency, args.seed + index, args.warmup)
+        print_report(results)
+    finally:
+        if process is not None:
+            client.close()
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = {
+        'meta': {
+            'mode': mode,
+            'database': database_url.split(':', 1)[0],
+            'users': args.users, 'expenses': args.expenses, 'food_entries': args.food_entries,
+            'requests': args.requests, 'concurrency': concurrency, 'warmup': args.warmup,
+            'python': platform.python_version(),
+            'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        },
+        'routes': results,
+    }
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.save_baseline), 'w', encoding='utf-8') as stream:
+            json.dump(report, stream, indent=2, ensure_ascii=False)
+            stream.write('\n')
+        print(f"Baseline salva em {baseline_path(args.save_baseline)}")
+
+    if args.compare:
+        with open(baseline_path(args.compare), encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        regressions = compare(results, baseline, args.metric, args.tolerance, args.min_delta_ms)
+        for route, before, after in regressions:
+            print(f"REGRESSÃO {route}: {args.metric} {before:.2f} -> {after:.2f}")
+        if regressions:
+            sys.exit(1)
+        print(f"Sem regressões em relação a '{args.compare}'.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark do hash de senhas (backend/passwords.py).
+
+Mede verificações por segundo (= logins por segundo, já que o login
+verifica um hash) em uma thread e com o pool de threads, para cada
+algoritmo/custo. Use para escolher o custo: algo entre 50 e 250 ms por
+verificação costuma ser o equilíbrio entre segurança e vazão.
+
+    python -m benchmarks.password_bench
+    python -m benchmarks.password_bench --seconds 5 --threads 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.passwords import PasswordHasher, argon2
+
+def configurations():
+    configs = [
+        ('scrypt n=2^14 r=8 p=1', dict(algorithm='scrypt', scrypt_n=2 ** 14)),
+        ('scrypt n=2^15 r=8 p=1', dict(algorithm='scrypt', scrypt_n=2 ** 15)),
+        ('pbkdf2_sha256 310k', dict(algorithm='pbkdf2_sha256', pbkdf2_iterations=310000)),
+        ('pbkdf2_sha256 600k', dict(algorithm='pbkdf2_sha256', pbkdf2_iterations=600000)),
+    ]
+    if argon2 is not None:
+        configs.append(('argon2id t=3 m=64MB', dict(algorithm='argon2')))
+    return configs
+
+def measure(fn, seconds, threads):
+    """Executa `fn` repetidamente por `seconds` segundos em `threads` threads"""
+    deadline = time.perf_counter() + seconds
+
+    def loop():
+        count = 0
+        while time.perf_counter() < deadline:
+            fn()
+            count += 1
+        return count
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        total = sum(executor.map(lambda _: loop(), range(threads)))
+    return total / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=3.0, help='Duração de cada medição.')
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    print(f"Núcleos: {cores}; threads no teste paralelo: {args.threads}")
+    print(f"{'configuração':<24}{'ms/login':>10}{'logins/s 1 thread':>19}{'logins/s pool':>15}{'por núcleo':>12}")
+    for label, options in configurations():
+        hasher = PasswordHasher(max_workers=args.threads, **options)
+        stored = hasher.hash('senha de teste')
+        single = measure(lambda: hasher._verify(stored, 'senha de teste'), args.seconds, 1)
+        pooled = measure(lambda: hasher.verify(stored, 'senha de teste'), args.seconds, args.threads)
+        print(f"{label:<24}{1000 / single:>10.1f}{single:>19.1f}{pooled:>15.1f}{pooled / cores:>12.1f}")
+
+if __name__ == '__main__':
+    main()
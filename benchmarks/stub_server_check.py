@@ -0,0 +1,187 @@
+"""
+Verificação dos clientes externos contra um servidor stub local.
+
+Sobe um http.server em 127.0.0.1 que responde rápido, devagar ou com
+erro conforme o cenário, e confere o comportamento do ResilientClient
+(timeout de leitura, abertura do circuito, chamada de teste no estado
+meio-aberto e fechamento após sucesso) e do DietGenerator (pedidos
+idênticos simultâneos viram uma única chamada ao modelo, e a seguinte
+vem do cache). Não acessa a rede externa.
+
+    python -m benchmarks.stub_server_check
+
+Sai com código 1 se alguma verificação falhar.
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from backend.diet_generator import DietGenerator
+from backend.http_client import CircuitBreaker, CircuitOpenError, ResilientClient
+
+class StubServer:
+    """Servidor HTTP local; `mode` define a resposta: 'ok', 'slow' ou 'error'"""
+
+    def __init__(self, delay=0.0):
+        self.mode = 'ok'
+        self.delay = delay
+        self.calls = 0
+        self.requests = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                with stub._lock:
+                    stub.calls += 1
+                    stub.requests.append({'path': self.path, 'headers': dict(self.headers),
+                                          'body': json.loads(body or b'null')})
+                    mode = stub.mode
+                if mode == 'slow':
+                    time.sleep(1.0)
+                elif stub.delay:
+                    time.sleep(stub.delay)
+
+                status = 500 if mode == 'error' else 200
+                payload = json.dumps(stub.response_for(self.path)).encode('utf-8')
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # o cliente desistiu por timeout
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def response_for(self, path):
+        return {'ok': True}
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+failures = []
+
+def check(condition, message):
+    print(f"{'✅' if condition else '❌'} {message}")
+    if not condition:
+        failures.append(message)
+
+def raises(exception, fn):
+    try:
+        fn()
+    except exception:
+        return True
+    except Exception:
+        return False
+    return False
+
+def check_circuit_breaker():
+    print('ResilientClient: timeouts e circuit breaker')
+    with StubServer() as stub:
+        reset = 0.3
+        client = ResilientClient(connect_timeout=0.5, read_timeout=0.2,
+                                 breaker=CircuitBreaker(failure_threshold=2, reset_timeout=reset))
+        breaker = client.breaker
+        post = lambda: client.post_json(stub.url, {'ping': 1})
+
+        check(post() == {'ok': True} and breaker.state == breaker.CLOSED, 'resposta ok com circuito fechado')
+
+        stub.mode = 'slow'
+        started = time.perf_counter()
+        check(raises(requests.Timeout, post), 'resposta lenta estoura o timeout de leitura')
+        check(time.perf_counter() - started < 0.8, 'timeout respeita read_timeout (não espera o servidor)')
+        check(breaker.state == breaker.CLOSED, 'uma falha não abre o circuito')
+        check(raises(requests.Timeout, post) and breaker.state == breaker.OPEN,
+              'segunda falha seguida abre o circuito')
+
+        calls = stub.calls
+        check(raises(CircuitOpenError, post) and stub.calls == calls,
+              'circuito aberto recusa a chamada sem tocar o servidor')
+
+        time.sleep(reset + 0.05)
+        stub.mode = 'error'
+        check(raises(requests.HTTPError, post) and stub.calls == calls + 1,
+              'após reset_timeout uma chamada de teste é liberada (meio-aberto)')
+        check(breaker.state == breaker.OPEN, 'falha no meio-aberto reabre o circuito')
+
+        time.sleep(reset + 0.05)
+        stub.mode = 'ok'
+        check(post() == {'ok': True} and breaker.state == breaker.CLOSED and breaker.failures == 0,
+              'sucesso no meio-aberto fecha o circuito')
+
+        outcomes = client.metrics.snapshot()['outcomes']
+        check(outcomes == {'success': 2, 'timeout': 2, 'circuit_open': 1, 'http_error': 1},
+              f"métricas por resultado: {outcomes}")
+
+class GeminiStub(StubServer):
+    """Responde no formato do generateContent"""
+
+    def response_for(self, path):
+        return {'candidates': [{'content': {'parts': [{'text': f"# Plano {self.calls}"}]}}]}
+
+def check_single_flight(concurrency=8):
+    print('DietGenerator: single-flight e cache')
+    profile = {'age': 30, 'gender': 'male', 'weight': 80, 'height': 180,
+               'goal': 'weight_loss', 'activityLevel': 'moderate'}
+    with GeminiStub(delay=0.3) as stub:
+        generator = DietGenerator(
+            api_url=stub.url, api_key='chave-de-teste', model='stub-model',
+            client=ResilientClient(connect_timeout=0.5, read_timeout=2.0)
+        )
+
+        barrier = threading.Barrier(concurrency)
+        results = []
+
+        def request():
+            barrier.wait()
+            results.append(generator.generate(profile, 600.0))
+
+        threads = [threading.Thread(target=request) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        origins = sorted(origin for _, origin in results)
+        check(stub.calls == 1, f"{concurrency} pedidos simultâneos, {stub.calls} chamada(s) ao modelo")
+        check(origins.count('model') == 1 and set(origins) <= {'model', 'shared', 'cache'},
+              f"uma chamada 'model' e as demais compartilhadas: {origins}")
+        check(len({text for text, _ in results}) == 1, 'todos recebem o mesmo texto')
+
+        request_sent = stub.requests[0]
+        check(request_sent['path'] == '/models/stub-model:generateContent'
+              and request_sent['headers'].get('x-goog-api-key') == 'chave-de-teste',
+              'chave enviada no header x-goog-api-key, fora da URL')
+
+        text, origin = generator.generate(profile, 600.0)
+        check(origin == 'cache' and stub.calls == 1, 'pedido seguinte sai do cache sem chamar o modelo')
+
+def main():
+    check_circuit_breaker()
+    print()
+    check_single_flight()
+    if failures:
+        print(f"\n{len(failures)} verificação(ões) falharam.")
+        sys.exit(1)
+    print('\nTodas as verificações passaram.')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Configuração do gunicorn (Procfile: gunicorn -c gunicorn.conf.py app:app).
+
+Padrão: workers gthread (processos x threads), sem dependências extras.
+Com GUNICORN_WORKER_CLASS=gevent (pip install gevent psycogreen) cada
+worker atende muitas requisições cooperativas; o gunicorn aplica o
+monkey patching antes de carregar o app, então o `requests` do AIService
+e do proxy do Gemini ficam cooperativos, e o psycopg2 é adaptado abaixo.
+
+O esquema do banco e a carga inicial do catálogo (flask init-db) rodam
+uma única vez, no master, antes de qualquer worker subir. Com a fase de
+release do deploy rodando `flask init-db`, use GUNICORN_INIT_DB=0.
+
+Variáveis: WEB_CONCURRENCY (processos), GUNICORN_WORKER_CLASS,
+GUNICORN_THREADS, GUNICORN_WORKER_CONNECTIONS, GUNICORN_TIMEOUT,
+GUNICORN_KEEPALIVE, GUNICORN_MAX_REQUESTS, GUNICORN_INIT_DB.
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+# 2 * núcleos + 1, com teto: cada processo tem o próprio pool de conexões e caches
+workers = _env_int('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8))
+threads = _env_int('GUNICORN_THREADS', 4)
+worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', 100)
+
+# O timeout precisa cobrir a chamada mais lenta ao modelo (GEMINI_READ_TIMEOUT)
+timeout = _env_int('GUNICORN_TIMEOUT', 90)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+
+# Recicla workers periodicamente para conter crescimento de memória
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 2000)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 200)
+
+# Sem preload: o engine do banco, o despachante de jobs e os caches são
+# criados depois do fork, um conjunto por processo
+preload_app = False
+
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+loglevel = os.environ.get('LOG_LEVEL', 'info').lower()
+
+# Pool do SQLAlchemy do tamanho da concorrência de cada processo: menos
+# conexões que threads faz requisições esperarem DB_POOL_TIMEOUT na fila
+_concurrency = worker_connections if worker_class == 'gevent' else threads
+os.environ.setdefault('DB_POOL_SIZE', str(max(5, min(_concurrency, 20))))
+
+def on_starting(server):
+    if os.environ.get('GUNICORN_INIT_DB', '1') in ('0', 'false'):
+        return
+    # Em subprocesso: o master não importa o app, então os workers continuam
+    # criando engine, despachante de jobs e caches depois do fork
+    server.log.info("Inicializando o banco (flask init-db)...")
+    app_uri = server.cfg.wsgi_app or server.app.app_uri
+    subprocess.run([sys.executable, '-m', 'flask', '--app', app_uri, 'init-db'], check=True)
+
+def post_fork(server, worker):
+    if worker_class != 'gevent':
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        server.log.warning("psycogreen não instalado: consultas ao PostgreSQL vão bloquear o worker gevent.")
+        return
+    patch_psycopg()